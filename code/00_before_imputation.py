@@ -8,9 +8,13 @@ VCF version4.2
 00_before_imputation.py
     -i (--input-file-path)
     -o (--output-file-path)
+    -r (--region)
 
 BeagleによるImputationを行う際の前処理用スクリプト。
 VCFのData lineを対象とし、そのうち genotype fieldからGT(genotype)だけを取り出す。
+GTの位置はFORMAT fieldから調べる(同じFORMATは一度だけ解析する)。
+--regionを指定すると、05_index.pyで作ったインデックスを使って
+その領域の行だけを読む。
 これが2倍体のフォーマットに沿わない場合、欠損値(./.)に変換して出力する。
 GTAKで2倍体にも関わらず半数体のジェノタイプが出たことがあり、
 下流の解析に詰まったことがあるため。
@@ -18,18 +22,28 @@ GTAKで2倍体にも関わらず半数体のジェノタイプが出たことが
 
 import argparse
 import datetime
-from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+from logging import getLogger, Logger, StreamHandler, FileHandler, INFO, Formatter
 import os
 import sys
 import time
-from typing import List
+from typing import Any, Dict, List
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_index import Iter_region_lines, Missing_contigs
 from my_utils import Runtime_counter
-from my_vcf import Remain_only_GT
+from my_vcf import Parse_format, Remain_only_GT
 
 
-def main():
+def Build_parser() -> argparse.ArgumentParser:
+    """
+    Build command line parser of this script.
+    Also used by 90_batch.py to parse shared settings.
+
+    Returns:
+    ----------
+    parser: argparse.ArgumentParser
+        Parser of command line arguments.
+    """
     ################ Setting command line arguments ################
     parser=argparse.ArgumentParser(
         description=__doc__,
@@ -44,71 +58,163 @@ def main():
     parser.add_argument(
         "-o", "--output-file-path", type=str, action="store",
         dest="outputFilePath", required=True, help="Path to output file.")
-    
-    args = parser.parse_args()
-    input_file_path: str = args.inputFilePath
-    output_file_path: str = args.outputFilePath
+
+    # 処理する領域
+    # (デフォルトはNone、全ての行)
+    parser.add_argument(
+        "-r", "--region", type=str, action="append", dest="regions",
+        default=None, help="Region to process. (e.g. Chr07:100-2000) \
+        Can be specified multiple times. Index made by 05_index.py is needed.")
+    return parser
+
+
+def Parse_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Convert command line arguments to settings.
+
+    Arguments:
+    ----------
+    args: argparse.Namespace
+        Arguments parsed by the parser of Build_parser function.
+
+    Returns:
+    ----------
+    settings: Dict[str, Any]
+        Settings given to Run function.
+    """
+    return {
+        "input_file_path": args.inputFilePath,
+        "output_file_path": args.outputFilePath,
+        "regions": args.regions,
+    }
     ################ End of setting command line arguments ################
 
 
-    ################ Setting of logger ################
-    logger = getLogger(__name__)
-    logger.setLevel(INFO)
-    sh = StreamHandler()
-    sh.setLevel(INFO)
-    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
-    fh = FileHandler(
-        filename=__file__ + datetime.datetime.now().isoformat() +".log")
-    fh.setLevel(INFO)
-    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
-    logger.addHandler(sh)
-    logger.addHandler(fh)
-    ################ End of setting of logger ################
+def Run(settings: Dict[str, Any], logger: Logger) -> Dict[str, Any]:
+    """
+    Remain only GT of a VCF with settings.
+
+    Arguments:
+    ----------
+    settings: Dict[str, Any]
+        Settings got from Parse_settings function.
+    logger: Logger
+        Logger to write progress.
 
+    Returns:
+    ----------
+    metrics: Dict[str, Any]
+        Number of written SNPs, SNPs without GT, and runtime(seconds).
+    """
+    input_file_path: str = settings["input_file_path"]
+    output_file_path: str = settings["output_file_path"]
+    regions: List[str] = settings["regions"]
 
     ################ Main process ################
     start: float = time.time()
+    count_SNPs: int = 0
+    no_GT_site: int = 0
 
     logger.info(__file__ + f"\n\
         \t\t\t\t--input_file_path {input_file_path}\n\
-        \t\t\t\t--output_file_path {output_file_path}\n")
+        \t\t\t\t--output_file_path {output_file_path}\n\
+        \t\t\t\t--region {regions}\n")
     logger.info("=======================================================")
     logger.info("Start program...")
 
     try:
         with open(input_file_path, "r") as input_file, \
             open(output_file_path, "w") as output_file:
-            for line in input_file:
+            # 領域が指定された場合はインデックスで直接その位置から読む
+            if regions:
+                for contig in Missing_contigs(input_file_path, regions):
+                    logger.info(f"Warning! {contig} is not in the index, \
+and it was skipped.")
+            lines = Iter_region_lines(input_file_path, regions) \
+                if regions else input_file
+            for line in lines:
                 line: str = line.rstrip("\n|\r|\r\n")
                 if line.startswith("#"): # Meta-information or header line
                     output_file.write(line + "\n")
                 else: #Data line
+                    count_SNPs += 1
                     splited_line: List[str] = line.split("\t")
+                    # GTが先頭にあるとは限らないのでFORMAT fieldから調べる
+                    layout: Dict[str, int] = Parse_format(splited_line[8])
                     splited_line[8] = "GT"
-                    splited_line[9:] = \
-                        list(map(Remain_only_GT, splited_line[9:]))
+                    if "GT" in layout:
+                        splited_line[9:] = [
+                            Remain_only_GT(geno, layout["GT"])
+                            for geno in splited_line[9:]]
+                    else:
+                        no_GT_site += 1
+                        splited_line[9:] = ["./."] * len(splited_line[9:])
                     new_line: str = "\t".join(splited_line)
                     output_file.write(new_line + "\n")
     except FileNotFoundError as fene:
         logger.info("Error!")
         logger.info(f"File: {fene.filename} does not exisit.")
+        if regions:
+            logger.info("--region needs index made by 05_index.py.")
         logger.info("Suspend the process.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
+    except ValueError as e:
+        # --regionの書式が誤っている、または入力がVCFでない場合
+        logger.info("Error!")
+        logger.info(f"{e}")
+        if regions:
+            logger.info("Check --region (e.g. Chr07:100-2000) and \
+the index of the input made by 05_index.py.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
     except UnicodeDecodeError:
         logger.info("Error!")
         logger.info("Maybe your file is compressed.")
         logger.info("Check it out.")
         logger.info("Suspend the process.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
     
     end: float = time.time()
     logger.info("Success processing!")
     logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+    logger.info(f"{count_SNPs} SNPs were written in your {output_file_path} .")
+    if no_GT_site:
+        logger.info(f"{no_GT_site} SNPs did not have GT in FORMAT, \
+            and they were converted to ./.")
     logger.info("Next step is Imputation!")
     logger.info("=======================================================")
     ################ End of main process ################
+    return {
+        "SNPs": count_SNPs,
+        "no_GT": no_GT_site,
+        "runtime": Runtime_counter(start, end)}
+
+
+def main():
+    args: argparse.Namespace = Build_parser().parse_args()
+    settings: Dict[str, Any] = Parse_settings(args)
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    fh = FileHandler(
+        filename=__file__ + datetime.datetime.now().isoformat() +".log")
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    ################ End of setting of logger ################
+
+
+
+    Run(settings, logger)
 
 if __name__=="__main__":
     main()
\ No newline at end of file
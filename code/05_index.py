@@ -0,0 +1,116 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+Python >= 3.7
+pysam (BGZFで圧縮したVCFを扱う場合のみ)
+
+05_index.py
+    -i (--input-file-path)
+    -b (--bin-size)
+
+VCFに位置のインデックスを作るスクリプト。
+インデックスがあれば00_before_imputation.py、10_after_imputation.pyの
+--regionで指定した領域だけを、ファイル全体を読まずに処理できる。
+(10_after_imputation.pyの数値データの出力を--regionで読むスクリプトは無い)
+
+テキストファイルの場合は<input>.vidxに染色体、binごとのバイト位置を書き出す。
+BGZF(bgzip)で圧縮したVCFの場合はtabixのインデックス(<input>.tbi)を作る。
+入力は染色体、物理位置の順に並んでいる必要がある。
+'''
+
+import argparse
+import datetime
+from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_index import BIN_SIZE, INDEX_SUFFIX, Build_index, Build_tabix, Is_bgzf
+from my_utils import Runtime_counter
+
+
+def main():
+    ################ Setting command line arguments ################
+    parser=argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    # 入力ファイルのパス(必須)
+    parser.add_argument(
+        "-i", "--input-file-path", type=str, action="store",
+        dest="inputFilePath", required=True, help="Path to input file.")
+
+    # binのサイズ(bp)
+    parser.add_argument(
+        "-b", "--bin-size", type=int, action="store",
+        dest="bin_size", default=BIN_SIZE,
+        help=f"Size(bp) of position bin. Ignored for BGZF. \
+        (default={BIN_SIZE})")
+
+    args = parser.parse_args()
+    input_file_path: str = args.inputFilePath
+    bin_size: int = args.bin_size
+    ################ End of setting command line arguments ################
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    fh = FileHandler(
+        filename=__file__ + datetime.datetime.now().isoformat() +".log")
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    ################ End of setting of logger ################
+
+
+    ################ Main process ################
+    start: float = time.time()
+
+    logger.info(__file__ + f"\n\
+        \t\t\t\t--input_file_path {input_file_path}\n\
+        \t\t\t\t--bin-size {bin_size}\n")
+    logger.info("=======================================================")
+    logger.info("Start program...")
+
+    try:
+        if Is_bgzf(input_file_path):
+            index_path: str = Build_tabix(input_file_path)
+        else:
+            Build_index(input_file_path, bin_size)
+            index_path = input_file_path + INDEX_SUFFIX
+    except FileNotFoundError as fene:
+        logger.info("Error!")
+        logger.info(f"File: {fene.filename} does not exisit.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    except ImportError:
+        logger.info("Error!")
+        logger.info("pysam is required to index BGZF compressed VCF.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    except (UnicodeDecodeError, ValueError) as e:
+        logger.info("Error!")
+        logger.info(f"{e}")
+        logger.info("Input must be sorted plain text or BGZF compressed VCF.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+
+    end: float = time.time()
+    logger.info("Success processing!")
+    logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+    logger.info(f"Index was written in {index_path} .")
+    logger.info("=======================================================")
+    ################ End of main process ################
+
+
+if __name__=="__main__":
+    main()
@@ -12,25 +12,113 @@ VCF version4.2
     -mM (--min-MAF)
     -mN (--max-NA)
     -rf (--remove-fields)
+    -v (--value)
+    -ob (--output-binary)
+    -im (--impute)
+    -mem (--max-memory)
+    -r (--region)
+    -op (--output-parquet)
+    -rg (--row-group-size)
+    -gf (--group-file)
+    -go (--group-output)
+    -qs (--site-stats)
 
 BeagleによるImputationを行った後、RやPythonで解析を進めるための前処理用スクリプト。
 ジェノタイプを数値データに変換し、不要な行、列を除く。
+FORMAT fieldは行ごとに解析し(同じFORMATは一度だけ)、GTやDSの位置を特定する。
+--value DSを指定するとBeagleのdosage(DS, 0 ~ 2)をそのまま出力する。
+GTが無くDSだけのVCFでは、MAF、NAの割合もdosageから求める。
+(GP、genotype probabilityには対応していない)
+--output-binaryを指定すると数値データをfloat32のバイナリ(SNP x sample)でも出力する。
+--imputeを指定するとImputation後も残ったNAをSNPごとの平均または最頻値で補完する。
+(最頻値はGTのコードのみ、DSでは平均を使う)
+補完した数はSNPごと(<output>.imputed_sites.txt)、
+サンプルごと(<output>.imputed_samples.txt)に書き出す。
+--regionを指定すると、05_index.pyで作ったインデックスを使って
+その領域の行だけを読む。
+--output-parquetを指定するとArrow/Parquet形式でも出力する。(pyarrowが必要)
+ジェノタイプはサンプルごとのint8の列(dosageなどはfloat32)、
+CHROM(コード), POS, IDは型つきの列で、row groupごとにSNPをまとめて書き出す。
+--group-fileにサンプルとグループの対応を指定すると、同じパスの中で
+グループごとのアレル頻度とグループ間のFst(Hudson)をSNPごとに書き出す。
+アレルの数はMAFのフィルタリングと共通で、一度だけ数える。
+--site-statsを指定すると、フィルタリング前の全てのSNPについて
+MAF、NAの割合、ヘテロ接合度(と書き出したかどうか)を書き出す。
+25_window_QC.pyでゲノム上のウィンドウごとに集計できる。
+#CHROM fieldは##contig行から作ったコード表で整数のコードに変換する。
+(Chr07, Gm07 -> 7、X, MTや番号が重複する染色体は100001からのコード)
+元の染色体名とコードの対応は<output>.contigs.txtに書き出す。
 '''
 
 import argparse
 import datetime
-from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+from logging import getLogger, Logger, StreamHandler, FileHandler, INFO, Formatter
 import os
 import sys
 import time
-from typing import List
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_impute import IMPUTE_METHODS, Impute_rows
+from my_index import Iter_region_lines, Missing_contigs
+from my_memory import Memory_type, Io_buffer_size, Rows_per_block, \
+    PARQUET_OVERHEAD
+from my_popgen import GT2alt_count, Calc_MAF_NA, Calc_MAF_NA_dosage, \
+    Calc_het_rate, \
+    Read_group_file, \
+    Group_counts, Group_pairs, Hudson_Fst
+from my_store import Values2array, Write_site, Write_store_meta, \
+    Parquet_dtype, Open_parquet, Write_parquet, Close_parquet
 from my_utils import Runtime_counter, Multi_pop
-from my_vcf import Check_alt, GT2numeric, Remain_only_GT, Calc_MAF, Calc_NA_rate, Change_chrom
+from my_vcf import Check_alt, GT2numeric, Remain_only_GT, Remain_only_DS, \
+    Calc_MAF, Calc_NA_rate, Change_chrom, Parse_format, \
+    Parse_contig, Build_contig_dict, Chrom_code, Check_order
 
 
-def main():
+# Parquetのrow groupのSNP数 (--max-memoryが無い時と上限)
+ROW_GROUP_SIZE: int = 100000
+
+
+def Row_group_size(max_memory: Optional[int], buffer_size: int,
+                   n_samples: int) -> int:
+    """
+    This function decides number of SNPs in a row group of Parquet output
+    from memory budget.
+
+    Arguments:
+    ----------
+    max_memory: int
+        Memory budget (bytes) got from Parse_memory function. (or None)
+    buffer_size: int
+        Size (bytes) of each write buffer of text and binary output.
+    n_samples: int
+        Number of samples.
+
+    Returns:
+    ----------
+    row_group_size: int
+        ROW_GROUP_SIZE, or less if a row group does not fit in max_memory.
+    """
+    if not max_memory:
+        return ROW_GROUP_SIZE
+    # テキストとバイナリの書き出しのバッファを除いた残り
+    remain: int = max(0, max_memory - 2 * max(0, buffer_size))
+    return min(ROW_GROUP_SIZE, Rows_per_block(
+        remain, n_samples, itemsize=4, overhead=PARQUET_OVERHEAD))
+
+
+def Build_parser() -> argparse.ArgumentParser:
+    """
+    Build command line parser of this script.
+    Also used by 90_batch.py to parse shared settings.
+
+    Returns:
+    ----------
+    parser: argparse.ArgumentParser
+        Parser of command line arguments.
+    """
     ################ Setting command line arguments ################
     parser=argparse.ArgumentParser(
         description=__doc__,
@@ -76,38 +164,154 @@ def main():
         default=False, help="Fileds of VCF to remove. Specify any or all of, \
         CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO, FORMAT \
         separated by colons(:) default=False")
-    
-    args = parser.parse_args()
+
+    # 出力する値
+    # GT: ジェノタイプを--convert-ruleで数値化, DS: dosageをそのまま出力
+    parser.add_argument(
+        "-v", "--value", type=str, action="store", dest="value",
+        default="GT", choices=["GT", "DS"],
+        help="Value to output. GT: genotype converted by --convert-rule, \
+        DS: ALT allele dosage (0 ~ 2) imputed by Beagle. default=GT")
+
+    # バイナリ形式での出力先
+    # (デフォルトはFalse、出力しない)
+    parser.add_argument(
+        "-ob", "--output-binary", type=str, action="store",
+        dest="output_binary", default=False,
+        help="Path to output float32 binary matrix (SNP x sample). \
+        <path>.sites and <path>.json are also written. default=False")
+
+    # 残ったNAの補完方法
+    # (デフォルトはFalse、補完しない)
+    parser.add_argument(
+        "-im", "--impute", type=str, action="store", dest="impute",
+        default=False, choices=IMPUTE_METHODS,
+        help="Fill remaining NA with mean or mode of each SNP. \
+        mode is only for GT. default=False, NA will be written as is.")
+
+    # メモリの上限
+    # 出力のバッファのサイズを決める
+    parser.add_argument(
+        "-mem", "--max-memory", type=Memory_type, action="store",
+        dest="max_memory", default=None,
+        help="Max memory to use. (e.g. 512M, 8G, auto) \
+        Output buffers (up to 4MB) and Parquet row groups are sized \
+        from it. default=None")
+
+    # 処理する領域
+    # (デフォルトはNone、全ての行)
+    parser.add_argument(
+        "-r", "--region", type=str, action="append", dest="regions",
+        default=None, help="Region to process. (e.g. Chr07:100-2000) \
+        Can be specified multiple times. Index made by 05_index.py is needed.")
+
+    # Parquet形式での出力先
+    # (デフォルトはFalse、出力しない)
+    parser.add_argument(
+        "-op", "--output-parquet", type=str, action="store",
+        dest="output_parquet", default=False,
+        help="Path to output Arrow/Parquet file. Genotypes are int8 columns \
+        (float32 for DS or mean imputation). pyarrow is required. \
+        default=False")
+
+    # Parquetのrow groupのSNP数
+    parser.add_argument(
+        "-rg", "--row-group-size", type=int, action="store",
+        dest="row_group_size", default=None,
+        help=f"Number of SNPs in a row group of Parquet output. \
+        (default={ROW_GROUP_SIZE}, or fitted in --max-memory)")
+
+    # サンプルとグループの対応(タブ区切り、サンプル名 グループ名)
+    # (デフォルトはFalse、計算しない)
+    parser.add_argument(
+        "-gf", "--group-file", type=str, action="store",
+        dest="group_file", default=False,
+        help="Path to sample -> group map (tab separated, sample and group). \
+        If specified, allele frequency of each group and pairwise Hudson Fst \
+        are written. default=False")
+
+    # グループごとの結果の出力先
+    parser.add_argument(
+        "-go", "--group-output", type=str, action="store",
+        dest="group_output", default=False,
+        help="Path to output of --group-file. \
+        default=<output-file-path>.groups.txt")
+
+    # SNPごとの統計量(MAF、NAの割合、ヘテロ接合度)の出力先
+    # (デフォルトはFalse、出力しない)
+    parser.add_argument(
+        "-qs", "--site-stats", type=str, action="store",
+        dest="site_stats", default=False,
+        help="Path to output MAF, NA rate and heterozygosity of all SNPs \
+        before filtering. Input of 25_window_QC.py. default=False")
+    return parser
+
+
+def Parse_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Check command line arguments and convert them to settings.
+
+    Arguments:
+    ----------
+    args: argparse.Namespace
+        Arguments parsed by the parser of Build_parser function.
+
+    Returns:
+    ----------
+    settings: Dict[str, Any]
+        Settings given to Run function.
+    """
     input_file_path: str = args.inputFilePath
     output_file_path: str = args.outputFilePath
+    value: str = args.value
+    output_binary: str = args.output_binary
+    impute: str = args.impute
+    max_memory: int = args.max_memory
+    regions: List[str] = args.regions
+    output_parquet: str = args.output_parquet
+    row_group_size: Optional[int] = args.row_group_size
+    group_file: str = args.group_file
+    group_output: str = args.group_output or output_file_path + ".groups.txt"
+    site_stats: str = args.site_stats
+    # 書き出しのバッファは数MBまで、残りはParquetのrow groupに使う
+    buffer_size: int = Io_buffer_size(max_memory)
 
     # []つきで受け取る
     # -1などが先頭に来ると他の引数と認識されるため
     if not args.convert_rule.startswith("[") or not args.convert_rule.endswith("]"):
         print(f"Argument --convert-rule must be enclosed in []")
-        sys.exit()
+        sys.exit(1)
     # []を取り除いてリストに変換する
     convert_rule: List[str] = list(args.convert_rule[1:-1].split(":"))
 
+    if row_group_size is not None and row_group_size < 1:
+        print("--row-group-size must be 1 or more.")
+        sys.exit(1)
+
+    # dosageは連続値なので最頻値は意味を持たない
+    if impute == "mode" and value == "DS":
+        print("--impute mode can not be used with --value DS.")
+        sys.exit(1)
+
     min_MAF: str = args.min_MAF
     if min_MAF != "NA":
         min_MAF = float(min_MAF)
         if min_MAF < 0.0 or min_MAF > 0.5:
             print("min_MAF must be 0 ~ 0.5")
-            sys.exit()
+            sys.exit(1)
     
     max_NA: str = args.max_NA
     if max_NA != "NA":
         max_NA = float(max_NA)
         if max_NA < 0.0 or max_NA > 1.0:
             print("max_NA must be 0 ~ 1")
-            sys.exit()
+            sys.exit(1)
 
     # []つきで受け取る
     if args.remove_fields:
         if not args.remove_fields.startswith("[") or not args.remove_fields.endswith("]"):
             print("Argument --remove-fields must be enclosed in []")
-            sys.exit()
+            sys.exit(1)
     # []を取り除いてリストに変換する、何も指定されていない場合空のリストを作る。
     remove_fields: List[str] = \
         args.remove_fields[1:-1].split(":") if args.remove_fields else []
@@ -120,24 +324,64 @@ def main():
             remove_fields_index.append(All_fields[field])
         except KeyError:
             print(f"{field}は入力ファイルに含まれていません。")
-            sys.exit()
+            sys.exit(1)
+    return {
+        "input_file_path": input_file_path,
+        "output_file_path": output_file_path,
+        "convert_rule": convert_rule,
+        "min_MAF": min_MAF,
+        "max_NA": max_NA,
+        "remove_fields": remove_fields,
+        "remove_fields_index": remove_fields_index,
+        "value": value,
+        "output_binary": output_binary,
+        "impute": impute,
+        "max_memory": max_memory,
+        "buffer_size": buffer_size,
+        "regions": regions,
+        "output_parquet": output_parquet,
+        "row_group_size": row_group_size,
+        "group_file": group_file,
+        "group_output": group_output,
+        "site_stats": site_stats,
+    }
     ################ End of setting command line arguments ################
 
 
-    ################ Setting of logger ################
-    logger = getLogger(__name__)
-    logger.setLevel(INFO)
-    sh = StreamHandler()
-    sh.setLevel(INFO)
-    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
-    fh = FileHandler(filename=__file__ \
-        + datetime.datetime.now().isoformat() +".log")
-    fh.setLevel(INFO)
-    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
-    logger.addHandler(sh)
-    logger.addHandler(fh)
-    ################ End of setting of logger ################
+def Run(settings: Dict[str, Any], logger: Logger) -> Dict[str, Any]:
+    """
+    Convert a VCF to numeric data with settings.
+
+    Arguments:
+    ----------
+    settings: Dict[str, Any]
+        Settings got from Parse_settings function.
+    logger: Logger
+        Logger to write progress.
 
+    Returns:
+    ----------
+    metrics: Dict[str, Any]
+        Number of written and removed SNPs, and runtime(seconds).
+    """
+    input_file_path: str = settings["input_file_path"]
+    output_file_path: str = settings["output_file_path"]
+    convert_rule: List[str] = settings["convert_rule"]
+    min_MAF: str = settings["min_MAF"]
+    max_NA: str = settings["max_NA"]
+    remove_fields: List[str] = settings["remove_fields"]
+    remove_fields_index: List[int] = settings["remove_fields_index"]
+    value: str = settings["value"]
+    output_binary: str = settings["output_binary"]
+    impute: str = settings["impute"]
+    max_memory: int = settings["max_memory"]
+    buffer_size: int = settings["buffer_size"]
+    regions: List[str] = settings["regions"]
+    output_parquet: str = settings["output_parquet"]
+    row_group_size: Optional[int] = settings["row_group_size"]
+    group_file: str = settings["group_file"]
+    group_output: str = settings["group_output"]
+    site_stats: str = settings["site_stats"]
 
     ################ Main process ################
     start: float = time.time()
@@ -148,7 +392,17 @@ def main():
         \t\t\t\t--convert-rule {convert_rule}\n\
         \t\t\t\t--min-MAF {min_MAF}\n\
         \t\t\t\t--max-NA {max_NA}\n\
-        \t\t\t\t--remove-fields {remove_fields}\n")
+        \t\t\t\t--remove-fields {remove_fields}\n\
+        \t\t\t\t--value {value}\n\
+        \t\t\t\t--output-binary {output_binary}\n\
+        \t\t\t\t--impute {impute}\n\
+        \t\t\t\t--max-memory {max_memory}\n\
+        \t\t\t\t--region {regions}\n\
+        \t\t\t\t--output-parquet {output_parquet}\n\
+        \t\t\t\t--row-group-size {row_group_size}\n\
+        \t\t\t\t--group-file {group_file}\n\
+        \t\t\t\t--group-output {group_output}\n\
+        \t\t\t\t--site-stats {site_stats}\n")
     logger.info("=======================================================")
     logger.info("Start program...")
 
@@ -157,15 +411,90 @@ def main():
     multi_alt_site: int = 0
     under_MAF_site: int = 0
     above_NA_site: int = 0
+    no_value_site: int = 0
+    unsorted_site: int = 0
+    samples: List[str] = []
+    imputed_samples: np.ndarray = np.zeros(0, dtype="int64")
+    contigs: List[str] = []
+    contig_dict: Dict[str, Any] = Build_contig_dict(contigs)
+    order_state: Dict[str, Any] = {}
+    parquet: Dict[str, Any] = {}
+    groups: List[str] = []
+    Fst_pairs: List[str] = []
+    counted: bool = bool(group_file or site_stats)
     try:
         with open(input_file_path, "r") as input_file, \
-            open(output_file_path, "w") as output_file:
-            for line in input_file:
+            open(output_file_path, "w", buffering=buffer_size) \
+                as output_file, \
+            open(output_binary or os.devnull, "wb", buffering=buffer_size) \
+                as binary_file, \
+            open(output_binary + ".sites" if output_binary else os.devnull,
+                 "w") as sites_file, \
+            open(output_file_path + ".imputed_sites.txt" if impute
+                 else os.devnull, "w") as imputed_sites_file, \
+            open(group_output if group_file else os.devnull, "w") \
+                as group_output_file, \
+            open(site_stats or os.devnull, "w") as site_stats_file:
+            # 領域が指定された場合はインデックスで直接その位置から読む
+            if regions:
+                for contig in Missing_contigs(input_file_path, regions):
+                    logger.info(f"Warning! {contig} is not in the index, \
+and it was skipped.")
+            lines = Iter_region_lines(input_file_path, regions) \
+                if regions else input_file
+            for line in lines:
                 line: str = line.rstrip("\n|\r|\r\n")
                 if line.startswith("##"): # Meta-information line
-                    pass # Meta-information lineは除く
+                    # Meta-information lineは除くが、##contigは記録しておく
+                    contig: str = Parse_contig(line)
+                    if contig is not None:
+                        contigs.append(contig)
                 elif line.startswith("#CHROM"): # Header line
+                    # 染色体のコード表はヘッダーから一度だけ作る
+                    contig_dict = Build_contig_dict(contigs)
                     splited_line: List[str] = line.split("\t")
+                    samples = splited_line[9:]
+                    imputed_samples = np.zeros(len(samples), dtype="int64")
+                    imputed_sites_file.write("CHROM\tPOS\tID\tN_IMPUTED\n")
+                    site_stats_file.write(
+                        "CHROM\tPOS\tID\tMAF\tNA_RATE\tHET_RATE\tPASS\n")
+                    if group_file:
+                        groups, group_index, unmatched = \
+                            Read_group_file(group_file, samples)
+                        if unmatched:
+                            logger.info(f"Warning! {len(unmatched)} samples \
+in {group_file} are not in the VCF. (e.g. {unmatched[:5]})")
+                        if (group_index < 0).any():
+                            logger.info(f"{int((group_index < 0).sum())} \
+samples of the VCF are not in any group.")
+                        # Fstには2つ以上のグループが必要
+                        if len(groups) < 2:
+                            logger.info("Error!")
+                            logger.info(f"{len(groups)} groups in \
+{group_file} matched samples of the VCF. 2 or more groups are needed.")
+                            logger.info("Suspend the process.")
+                            logger.info("=======================================================")
+                            sys.exit(1)
+                        first, second = Group_pairs(groups)
+                        Fst_pairs = [f"{groups[i]}_{groups[j]}"
+                                     for i, j in zip(first, second)]
+                        numerator_sum: np.ndarray = np.zeros(len(Fst_pairs))
+                        denominator_sum: np.ndarray = np.zeros(len(Fst_pairs))
+                        group_output_file.write("\t".join(
+                            ["CHROM", "POS", "ID"]
+                            + [f"AF_{g}" for g in groups]
+                            + [f"N_{g}" for g in groups]
+                            + [f"FST_{pair}" for pair in Fst_pairs]) + "\n")
+                    if output_parquet:
+                        if row_group_size is None:
+                            row_group_size = Row_group_size(
+                                max_memory, buffer_size, len(samples))
+                            logger.info(f"Row group size is {row_group_size}.")
+                        parquet = Open_parquet(
+                            output_parquet, samples,
+                            Parquet_dtype(value, convert_rule, impute),
+                            row_group_size, value=value,
+                            contigs=contig_dict["codes"])
                     # #CHROMの#の部分は要らない。
                     # Rで読み込めなくなるから。
                     splited_line[0] = "CHROM"
@@ -175,20 +504,57 @@ def main():
                 else: # Data line
                     splited_line: List[str] = line.split("\t")
 
+                    # 染色体をコードに変換し、並び順を確認する。
+                    chrom_code: int = Chrom_code(splited_line[0], contig_dict)
+                    if not Check_order(chrom_code, int(splited_line[1]),
+                                       order_state):
+                        unsorted_site += 1
+
+                    # FORMAT fieldからGTとDSの位置を調べる。
+                    # 同じFORMATはキャッシュされるので解析は一度だけ。
+                    layout: Dict[str, int] = Parse_format(splited_line[8])
+                    GT_index: int = layout.get("GT")
+                    DS_index: int = layout.get("DS")
+                    geno_list: List[str] = splited_line[9:]
+
                     # 縦棒が残っているとMAFの計算に影響が出るので変換する
                     # Remain_only_GTを使うのは、
                     # 生のVCFから直接このスクリプトを動かす時に必要なため
-                    splited_line[9:] = \
-                        list(map(Remain_only_GT, splited_line[9:]))
-                    if Check_alt(splited_line[4]):
+                    if GT_index is None:
+                        splited_line[9:] = ["./."] * len(geno_list)
+                    else:
+                        splited_line[9:] = [Remain_only_GT(geno, GT_index)
+                                            for geno in geno_list]
+                    # グループごとに集計する場合、SNPごとの統計量を出す場合は
+                    # アレルの数を一度だけ数え、MAF、NAの割合にも使う
+                    if counted:
+                        alt_count: np.ndarray = GT2alt_count(splited_line[9:])
+                        site_MAF, site_NA = Calc_MAF_NA(alt_count)
+                    # GTが無くDSだけのVCFでは、dosageからMAF、NAの割合を求める
+                    from_DS: bool = value == "DS" and GT_index is None \
+                        and DS_index is not None
+                    if from_DS:
+                        DS_list: List[str] = [Remain_only_DS(geno, DS_index)
+                                              for geno in geno_list]
+                        site_MAF, site_NA = \
+                            Calc_MAF_NA_dosage(Values2array(DS_list))
+                    site_pass: int = 0
+                    # POS, IDは除かれることがあるので先に取っておく
+                    site_pos, site_ID = splited_line[1:3]
+                    if value == "DS" and DS_index is None:
+                        no_value_site += 1 # DSが無いSNPは書き出さない
+                    elif Check_alt(splited_line[4]):
                         multi_alt_site += 1 # multi allelic siteの場合は書き出さない
-                    elif min_MAF != "NA" and Calc_MAF(splited_line[9:]) <= min_MAF:
+                    elif min_MAF != "NA" and (site_MAF if counted or from_DS \
+                        else Calc_MAF(splited_line[9:])) <= min_MAF:
                         under_MAF_site += 1 # min_MAF以下のSNPは書き出さない
-                    elif max_NA != "NA" and Calc_NA_rate(splited_line[9:]) >= max_NA:
+                    elif max_NA != "NA" and (site_NA if counted or from_DS \
+                        else Calc_NA_rate(splited_line[9:])) >= max_NA:
                         above_NA_site += 1 # max_NA以上のNAの割合のSNPは書き出さない
                     else:
-                        # #CHROM fieldを染色体番号だけに変える。
-                        splited_line[0] = Change_chrom(splited_line[0])
+                        site_pass = 1
+                        # #CHROM fieldを染色体のコードに変える。
+                        splited_line[0] = str(chrom_code)
 
                         # ID fieldになにも記述がなければ("."ならば)
                         # "染色体番号"-"物理位置"の形式に書き換える。
@@ -196,9 +562,56 @@ def main():
                             splited_line[2] = \
                                 splited_line[0] + "-" +splited_line[1]
                         
+                        # グループごとのアレル頻度とFst
+                        if group_file:
+                            alt_alleles, called_alleles = Group_counts(
+                                alt_count, group_index, len(groups))
+                            Fst, numerator, denominator = Hudson_Fst(
+                                alt_alleles, called_alleles, first, second)
+                            numerator_sum += numerator
+                            denominator_sum += denominator
+                            with np.errstate(divide="ignore", invalid="ignore"):
+                                freq: np.ndarray = alt_alleles / called_alleles
+                            group_output_file.write("\t".join(
+                                splited_line[0:3]
+                                + [f"{x:.6g}" if x == x else "NA" for x in freq]
+                                + [str(n) for n in called_alleles]
+                                + [f"{x:.6g}" if x == x else "NA" for x in Fst])
+                                + "\n")
+
                         # GTを数値データに変換する
-                        splited_line[9:] = \
-                            GT2numeric(splited_line[9:], convert_rule)
+                        # DSの場合はdosageをそのまま使う
+                        if from_DS:
+                            splited_line[9:] = DS_list
+                        elif value == "DS":
+                            splited_line[9:] = [
+                                Remain_only_DS(geno, DS_index)
+                                for geno in geno_list]
+                        else:
+                            splited_line[9:] = \
+                                GT2numeric(splited_line[9:], convert_rule)
+
+                        # 残ったNAを補完する
+                        # 変換と同じパスで行うので、読み直しは要らない
+                        if impute and "NA" in splited_line[9:]:
+                            array: np.ndarray = Values2array(splited_line[9:])
+                            array, filled_mask = Impute_rows(array, impute)
+                            for i in np.flatnonzero(filled_mask):
+                                splited_line[9 + i] = f"{array[i]:g}"
+                            imputed_samples += filled_mask
+                            if filled_mask.any():
+                                imputed_sites_file.write("\t".join(
+                                    splited_line[0:3]
+                                    + [str(filled_mask.sum())]) + "\n")
+
+                        if output_binary or output_parquet:
+                            array = Values2array(splited_line[9:])
+                        if output_binary:
+                            Write_site(binary_file, sites_file,
+                                       splited_line[0:3], array)
+                        if output_parquet:
+                            Write_parquet(parquet, [chrom_code,
+                                int(splited_line[1]), splited_line[2]], array)
 
                         # 不要な列を除く
                         splited_line = \
@@ -207,25 +620,89 @@ def main():
                         new_line: str = "\t".join(splited_line)
                         output_file.write(new_line + "\n")
                         count_SNPs += 1
+                    if site_stats:
+                        # 書き出さないSNPも含めて全て記録する
+                        # (フィルタリングの閾値を決めるため)
+                        site_stats_file.write("\t".join(
+                            [str(chrom_code), site_pos, site_ID
+                             if site_ID != "." else f"{chrom_code}-{site_pos}"]
+                            + [f"{x:.6g}" if x == x else "NA" for x in
+                               (site_MAF, site_NA, Calc_het_rate(alt_count))]
+                            + [str(site_pass)]) + "\n")
                 #count_line += 1 
+        if parquet:
+            Close_parquet(parquet)
     except FileNotFoundError as fene:
         logger.info("Error!")
         logger.info(f"File: {fene.filename} does not exisit.")
+        if regions:
+            logger.info("--region needs index made by 05_index.py.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    except ImportError:
+        logger.info("Error!")
+        logger.info("pyarrow is required for --output-parquet.")
         logger.info("Suspend the process.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
+    except ValueError as e:
+        # --regionの書式が誤っている、または入力がVCFでない場合
+        logger.info("Error!")
+        logger.info(f"{e}")
+        if regions:
+            logger.info("Check --region (e.g. Chr07:100-2000) and \
+the index of the input made by 05_index.py.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
     except UnicodeDecodeError:
         logger.info("Error!")
         logger.info("Maybe your file is compressed.")
         logger.info("Check it out.")
         logger.info("Suspend the process.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
     
+    if impute:
+        with open(output_file_path + ".imputed_samples.txt", "w") as f:
+            f.write("sample\tN_IMPUTED\n")
+            for sample, n in zip(samples, imputed_samples):
+                f.write(f"{sample}\t{n}\n")
+        logger.info(f"{imputed_samples.sum()} NA were filled with {impute}.")
+
+    if group_file:
+        logger.info(f"{len(groups)} groups: {groups}")
+        # ゲノム全体のFstは分子、分母それぞれの平均の比
+        for pair, num, den in zip(Fst_pairs, numerator_sum, denominator_sum):
+            genome_Fst: str = f"{num / den:.6g}" if den > 0 else "NA"
+            logger.info(f"Genome-wide Hudson Fst {pair} = {genome_Fst}")
+
+    if output_binary:
+        Write_store_meta(output_binary, samples, count_SNPs, value,
+                         contigs=contig_dict["codes"])
+
     end: float = time.time()
     logger.info("Success processing!")
     logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
     logger.info(f"{count_SNPs} SNPs were written in your {output_file_path} .")
+    # 元の染色体名が分かるように対応表を書き出す
+    with open(output_file_path + ".contigs.txt", "w") as f:
+        f.write("CONTIG\tCODE\n")
+        for name, code in contig_dict["codes"].items():
+            f.write(f"{name}\t{code}\n")
+    # 番号から決まらないコードは確認できるように書き出す
+    other_codes: Dict[str, int] = {
+        name: code for name, code in contig_dict["codes"].items()
+        if Change_chrom(name) != str(code)}
+    if other_codes:
+        logger.info(f"Chromosome codes: {other_codes}")
+    if unsorted_site:
+        logger.info(f"Warning! {unsorted_site} SNPs were not sorted \
+            by chromosome and position.")
+    if no_value_site:
+        logger.info(f"{no_value_site} SNPs did not have {value} in FORMAT, \
+            and they were removed.")
     if multi_alt_site:
         logger.info(f"{multi_alt_site} SNPs were multi allelic site, \
             and they were removed.")
@@ -237,6 +714,38 @@ def main():
         logger.info(f"Field: {remove_fields} were removed.")
     logger.info("=======================================================")
     ################ End of main process ################
+    return {
+        "SNPs": count_SNPs,
+        "multi_allelic": multi_alt_site,
+        "under_MAF": under_MAF_site,
+        "above_NA": above_NA_site,
+        "no_value": no_value_site,
+        "unsorted": unsorted_site,
+        "runtime": Runtime_counter(start, end)}
+
+
+def main():
+    args: argparse.Namespace = Build_parser().parse_args()
+    settings: Dict[str, Any] = Parse_settings(args)
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    fh = FileHandler(filename=__file__ \
+        + datetime.datetime.now().isoformat() +".log")
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    ################ End of setting of logger ################
+
+
+
+    Run(settings, logger)
 
 
 if __name__=="__main__":
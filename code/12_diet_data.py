@@ -6,25 +6,30 @@ Python >= 3.7
 12_diet_data.py
     -i (--input-file-path)
     -o (--output-file-path)
-
+    -mem (--max-memory)
 
 データ量が多くメモリに乗り切らない計算を行う場合において
 データを削減するスクリプト。デフォルトでは1/10に削減する。
 PCAなどデータを要約する場合向け。
+--max-memoryを指定すると、PCAで必要なメモリの見積もりが
+上限に収まるように削減率を自動で決める。
 '''
 
 
 import argparse
 import datetime
+import math
 from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
 import os
 import random
+import shutil
 import subprocess
 import sys
 import time
 
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_memory import Memory_type, Bytes_per_row, Count_columns, PCA_OVERHEAD
 from my_utils import Runtime_counter
 
 
@@ -44,10 +49,19 @@ def main():
     parser.add_argument(
         "-o", "--output-file-path", type=str, action="store",
         dest="outputFilePath", required=True, help="Path to output file.")
+
+    # メモリの上限
+    # (デフォルトはNone、1/10に削減する)
+    parser.add_argument(
+        "-mem", "--max-memory", type=Memory_type, action="store",
+        dest="max_memory", default=None,
+        help="Max memory to use in PCA. (e.g. 512M, 8G, auto) \
+        If specified, diet rate is decided automatically. default=1/10")
     
     args = parser.parse_args()
     input_file_path: str = args.inputFilePath
     output_file_path: str = args.outputFilePath
+    max_memory: int = args.max_memory
     ################ End of setting command line arguments ################
 
 
@@ -71,7 +85,8 @@ def main():
 
     logger.info(__file__ + f"\n\
         \t\t\t\t--input_file_path {input_file_path}\n\
-        \t\t\t\t--output_file_path {output_file_path}\n")
+        \t\t\t\t--output_file_path {output_file_path}\n\
+        \t\t\t\t--max-memory {max_memory}\n")
     logger.info("=======================================================")
     logger.info("Start program...")
 
@@ -85,29 +100,42 @@ def main():
         logger.info("Maybe input file does not exist.")
         logger.info("Suspend the process.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
     num_lines: int = int(proc_res.stdout.decode().split(" ")[0])
 
     # 全体のdiet_rate分の1をランダムに選び出力する。
     # ただし1行目はヘッダーとして必ず残す。
     # in演算子を使う場合listよりsetの方が高速なのでsetに変換する。
     diet_rate: int = 10
-    outlines: set = \
-        set([1] + random.sample(range(2, num_lines+1), k=int(num_lines/diet_rate)))
-    i: int = 1
+    if max_memory:
+        # PCAで必要なメモリの見積もりが上限に収まるようにする。
+        required: int = num_lines * Bytes_per_row(
+            Count_columns(input_file_path), overhead=PCA_OVERHEAD)
+        diet_rate = max(1, math.ceil(required / max_memory))
+    logger.info(f"Diet rate is 1/{diet_rate}.")
     try:
-        with open(input_file_path, "r") as input_file, \
-            open(output_file_path, "w") as output_file:
-            for line in input_file:
-                if i in outlines:
-                    output_file.write(line)
-                i += 1
+        if diet_rate == 1:
+            # 削減しなくても上限に収まる場合はそのままコピーする
+            shutil.copyfile(input_file_path, output_file_path)
+            logger.info("Input already fits in max memory, and was copied.")
+        else:
+            # ヘッダー以外の行数を超えて選ぶことはできない
+            outlines: set = set([1] + random.sample(
+                range(2, num_lines+1),
+                k=min(num_lines-1, int(num_lines/diet_rate))))
+            i: int = 1
+            with open(input_file_path, "r") as input_file, \
+                open(output_file_path, "w") as output_file:
+                for line in input_file:
+                    if i in outlines:
+                        output_file.write(line)
+                    i += 1
     except FileNotFoundError as fene:
         logger.info("Error!")
         logger.info(f"File: {fene.filename} does not exisit.")
         logger.info("Suspend the process.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
 
     end: float = time.time()
     logger.info("Success processing!")
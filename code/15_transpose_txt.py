@@ -12,12 +12,23 @@ PCA(主成分分析)などの前処理用.
 目安としてメモリ32GBのメモリで255系統・6,000,000SNPsを
 PythonやRのデータフレーム形式で読み込んで
 転置しようとすると、そこそこ工夫しないと途中でメモリ不足になる.
+--max-memoryを指定すると、列数からチャンクサイズを自動で決める.
 '''
 
 import argparse
+import os
+import sys
 
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_memory import Memory_type, Rows_per_block, Count_columns
+
+
+# 1行あたりのメモリの見積もり
+# 読み込んだチャンク、転置したもの、書き出し時の文字列で3倍程度になる.
+TRANSPOSE_OVERHEAD: float = 3.0
+
 def main():
     ################ Setting command line arguments ################
     parser=argparse.ArgumentParser(
@@ -32,12 +43,25 @@ def main():
     # チャンクサイズ(一度に読み込む行)
     parser.add_argument(
         "-c", "--chunk-size", type=int, action="store",
-        dest="chunk_size", default=500000, required=True, 
+        dest="chunk_size", default=500000,
         help="Chunk size(lines) to read at one time. (default=500000)")
+
+    # メモリの上限
+    # 指定した場合は--chunk-sizeより優先する
+    parser.add_argument(
+        "-mem", "--max-memory", type=Memory_type, action="store",
+        dest="max_memory", default=None,
+        help="Max memory to use. (e.g. 512M, 8G, auto) \
+        If specified, chunk size is decided automatically.")
     
     args = parser.parse_args()
     input_file_path: str = args.inputFilePath
     chunk_size: int = args.chunk_size
+    max_memory: int = args.max_memory
+    if max_memory:
+        chunk_size = Rows_per_block(
+            max_memory, Count_columns(input_file_path),
+            overhead=TRANSPOSE_OVERHEAD)
     ################ End of setting command line arguments ################
 
 
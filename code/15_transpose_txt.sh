@@ -10,17 +10,27 @@
 # I/Oが多くかなりのボトルネックになるので、時間はかかる。
 
 # 引数
+# 3つ目の引数はチャンクサイズ(行数)、または512M, 8G, autoのようなメモリの上限.
+# メモリの上限を指定した場合はチャンクサイズを自動で決める.
 INPUT=$1;
 OUTPUT=$2;
 CHUNK=${3:-500000}
+# 15_transpose_txt.pyはこのスクリプトと同じディレクトリにある
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
 #echo $CHUNK
+if [[ $CHUNK =~ ^[0-9]+$ ]]; then
+  CHUNK_OPTION="-c $CHUNK";
+else
+  CHUNK_OPTION="-mem $CHUNK";
+fi
 
 TMPDIR="xxxTMPDIRxxx"
 rm -rf $TMPDIR;
 mkdir $TMPDIR;
 
 # 対象のファイルをチャンクごとに転置して出力する。
-python 15_transpose_txt.py -i $INPUT -c $CHUNK
+# 失敗した場合は途中のファイルを消して終了コード1で終わる。
+python "$SCRIPT_DIR/15_transpose_txt.py" -i $INPUT $CHUNK_OPTION || { rm -rf $TMPDIR; exit 1; }
 
 # 各チャンクの改行コードを変換する
 for chunk in `ls -v $TMPDIR`;
@@ -6,9 +6,25 @@ numpy==1.20.1
 pandas==1.2.2
 scikit-learn==0.24.1
 
-10_after_imputation.py
+20_PCA.py
     -i (--input-file-path)
     -od (--output-dir)
+    -nc (--n-components)
+    -p (--project)
+    -c (--chunk-size)
+    -im (--impute)
+    -mem (--max-memory)
+
+PCAを行い、主成分スコア、寄与率と、
+新しいサンプルを射影するためのモデル(PCA_Model.npz)を出力する。
+--projectにモデルを指定すると、PCAをやり直さずに
+入力ファイルのサンプルをチャンクごとに読み込んで射影する。
+--imputeを指定すると読み込み時にNAをSNPごとの平均または最頻値で補完し、
+補完した数をSNPごと(Imputed_SNPs.txt)、サンプルごと(Imputed_samples.txt)に書き出す。
+--max-memoryを指定すると、必要なメモリを見積もってチャンクサイズを決め、
+上限を超える場合はメモリ不足になる前にout-of-coreのPCAに切り替える。
+(SNPのチャンクごとにサンプル間の行列を足し合わせ、固有値分解する。
+モデルの保存のためにもう一度入力ファイルを読む。)
 
 入力ファイルの想定
 ID    sample1    sample2    sample3    sample4
@@ -22,10 +38,11 @@ SNP5     0         -1         -1          0
 
 import argparse
 import datetime
-from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+from logging import getLogger, Logger, StreamHandler, FileHandler, INFO, Formatter
 import os
 import sys
 import time
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
@@ -33,6 +50,11 @@ from sklearn.decomposition import PCA
 
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_impute import IMPUTE_METHODS, Impute_rows
+from my_memory import Memory_type, Bytes_per_row, Rows_per_block, \
+    Count_columns, Count_lines, PCA_OVERHEAD
+from my_pca import Save_model, Load_model, Init_scores, Project_chunk, \
+    Standardize_chunk, Gram_eigen
 from my_utils import Runtime_counter
 
 
@@ -57,10 +79,52 @@ def main():
     #     "-s", "--standardized", type=bool, action="store", \
     #     dest="standardized", default=True, help="If True, standardize data.\
     #     (default=True)")
+
+    # 主成分の数(デフォルトは全て)
+    parser.add_argument(
+        "-nc", "--n-components", type=int, action="store",
+        dest="n_components", default=None,
+        help="Number of principal components to keep. (default=all)")
+
+    # 新しいサンプルを射影する場合のモデルのパス
+    # (デフォルトはFalse、PCAを行う)
+    parser.add_argument(
+        "-p", "--project", type=str, action="store",
+        dest="project", default=False,
+        help="Path to PCA_Model.npz. If specified, samples in input file \
+        are projected onto the model without refitting. default=False")
+
+    # 射影する際のチャンクサイズ(一度に読み込む行)
+    parser.add_argument(
+        "-c", "--chunk-size", type=int, action="store",
+        dest="chunk_size", default=100000,
+        help="Chunk size(lines) to read at one time in --project mode. \
+        (default=100000)")
+
+    # NAの補完方法
+    # (デフォルトはFalse、補完しない)
+    parser.add_argument(
+        "-im", "--impute", type=str, action="store", dest="impute",
+        default=False, choices=IMPUTE_METHODS,
+        help="Fill NA with mean or mode of each SNP before PCA. \
+        Use mean for dosages (DS). default=False")
+
+    # メモリの上限
+    # (デフォルトはNone、全て読み込む)
+    parser.add_argument(
+        "-mem", "--max-memory", type=Memory_type, action="store",
+        dest="max_memory", default=None,
+        help="Max memory to use. (e.g. 512M, 8G, auto) If input is larger, \
+        out-of-core PCA is used. Chunk size is also decided automatically.")
     
     args = parser.parse_args()
     input_file_path: str = args.inputFilePath
     out_dir: str = args.output_dir
+    n_components: int = args.n_components
+    project: str = args.project
+    chunk_size: int = args.chunk_size
+    impute: str = args.impute
+    max_memory: int = args.max_memory
     # Make directory if does not exist.
     if not os.path.isdir(out_dir):
         os.mkdir(out_dir)
@@ -88,10 +152,55 @@ def main():
 
     logger.info(__file__ + f"\n\
         \t\t\t\t--input_file_path {input_file_path}\n\
-        \t\t\t\t--output_dir {out_dir}\n")
+        \t\t\t\t--output_dir {out_dir}\n\
+        \t\t\t\t--n-components {n_components}\n\
+        \t\t\t\t--project {project}\n\
+        \t\t\t\t--chunk-size {chunk_size}\n\
+        \t\t\t\t--impute {impute}\n\
+        \t\t\t\t--max-memory {max_memory}\n")
     logger.info("=======================================================")
     logger.info("Start program...")
 
+    # メモリの上限から、チャンクサイズと読み込み方を決める。
+    out_of_core: bool = False
+    if max_memory:
+        try:
+            n_samples: int = Count_columns(input_file_path) - 1
+            n_SNPs: int = Count_lines(input_file_path) - 1
+        except FileNotFoundError as fene:
+            logger.info("Error!")
+            logger.info(f"File: {fene.filename} does not exisit.")
+            logger.info("Suspend the process.")
+            logger.info("=======================================================")
+            sys.exit(1)
+        bytes_per_row: int = \
+            Bytes_per_row(n_samples, overhead=PCA_OVERHEAD)
+        # サンプル間の行列(sample x sample)の分は先に差し引く。
+        budget: int = max(max_memory - n_samples * n_samples * 8, 0)
+        chunk_size = Rows_per_block(budget, n_samples, overhead=PCA_OVERHEAD)
+        out_of_core = n_SNPs * bytes_per_row > max_memory
+        logger.info(f"Estimated memory: {n_SNPs * bytes_per_row} bytes, \
+chunk size: {chunk_size} lines")
+
+    if project:
+        Project_samples(input_file_path, out_dir, project, chunk_size, logger)
+        end: float = time.time()
+        logger.info("Success processing!")
+        logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+        logger.info("=======================================================")
+        return
+
+    if out_of_core:
+        logger.info("Input is larger than --max-memory, \
+so out-of-core PCA is used.")
+        Out_of_core_PCA(input_file_path, out_dir, n_components, impute,
+                        chunk_size, logger)
+        end: float = time.time()
+        logger.info("Success processing!")
+        logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+        logger.info("=======================================================")
+        return
+
     try:
         # Reading data as pandas dataframe
         try:
@@ -102,31 +211,59 @@ def main():
             logger.info(f"File: {fene.filename} does not exisit.")
             logger.info("Suspend the process.")
             logger.info("=======================================================")
-            sys.exit()
+            sys.exit(1)
+
+        # Filling NA by each line(SNP).
+        if impute:
+            logger.info("Imputing data...")
+            filled, filled_mask = Impute_rows(df.to_numpy(dtype="float64"), impute)
+            df = pd.DataFrame(filled, index=df.index, columns=df.columns)
+            filled_count: pd.DataFrame = \
+                pd.DataFrame(filled_mask, index=df.index, columns=df.columns)
+            imputed_SNPs: pd.Series = filled_count.sum(axis=1)
+            imputed_SNPs[imputed_SNPs > 0].to_csv(
+                f"{out_dir}/Imputed_SNPs.txt", sep="\t", header=["N_IMPUTED"])
+            filled_count.sum(axis=0).to_csv(
+                f"{out_dir}/Imputed_samples.txt", sep="\t",
+                header=["N_IMPUTED"], index_label="sample")
+            logger.info(f"{filled_mask.sum()} NA were filled with {impute}.")
 
         # Standardizing by each line(SNP).
+        # 平均と標準偏差は射影用のモデルにも保存する。
         logger.info("Standardizing data...")
-        df = df.apply(lambda x: (x-x.mean())/x.std(ddof=True), axis=1)
+        snp_mean: pd.Series = df.mean(axis=1)
+        snp_sd: pd.Series = df.std(axis=1, ddof=1)
+        # 多型の無いSNPは標準化できない(0で割る)ので除く。
+        polymorphic: pd.Series = snp_sd > 0
+        if not polymorphic.all():
+            logger.info(f"{(~polymorphic).sum()} SNPs were monomorphic, \
+and they were removed.")
+            df = df[polymorphic]
+            snp_mean = snp_mean[polymorphic]
+            snp_sd = snp_sd[polymorphic]
+        df = df.sub(snp_mean, axis=0).div(snp_sd, axis=0)
         df = df.T
 
         # Performing PCA
         logger.info("Performing Principal Component Analysis ...")
-        pca: PCA = PCA()
+        pca: PCA = PCA(n_components=n_components)
         try:
             pca.fit(df)
         except ValueError as ve:
             logger.info("Error!")
             logger.info("Maybe your input file contains NA.")
-            logger.info("Please imputate your file before PCA.")
+            logger.info("Please imputate your file before PCA, \
+or use --impute option.")
             logger.info("=======================================================")
-            sys.exit()
+            sys.exit(1)
 
         res: np.ndarray = pca.transform(df)
+        PCs: List[str] = [f"PC{x}" for x in range(1, pca.n_components_+1)]
 
         # 主成分スコア
         pca_score: pd.DataFrame = pd.DataFrame(
             data=res,
-            columns=[f"PC{x}" for x in range(1, len(df.index)+1)],
+            columns=PCs,
             index=df.index)
         pca_score.to_csv(f"{out_dir}/PCA_Score.txt", sep="\t")
 
@@ -134,9 +271,19 @@ def main():
         evr:pd.DataFrame = pd.DataFrame(
             data=pca.explained_variance_ratio_,
             columns=["explained_variance_ratio"],
-            index=[f"PC{x}" for x in range(1, len(df.index)+1)])
+            index=PCs)
         evr.to_csv(f"{out_dir}/Expl_Var_Ratio.txt", sep="\t")
 
+        # 新しいサンプルを射影するためのモデル
+        logger.info("Saving PCA model...")
+        Save_model(f"{out_dir}/PCA_Model.npz",
+                   components=pca.components_,
+                   snp_mean=snp_mean.to_numpy(),
+                   snp_sd=snp_sd.to_numpy(),
+                   pca_mean=pca.mean_,
+                   snp_ids=df.columns.astype(str).tolist(),
+                   explained_variance_ratio=pca.explained_variance_ratio_)
+
         # # 固有値
         # ev:pd.DataFrame = pd.DataFrame(
         #     data=pca.explained_variance_,
@@ -148,9 +295,10 @@ def main():
     except MemoryError:
         logger.info("Error!")
         logger.info("Input data is too large and memory is insufficient.")
-        logger.info("Please diet input file by using \"12_diet_data.py\" before PCA.")
+        logger.info("Please diet input file by using \"12_diet_data.py\" before PCA, \
+or use --max-memory option.")
         logger.info("=======================================================")
-        sys.exit()
+        sys.exit(1)
     
     end: float = time.time()
     logger.info("Success processing!")
@@ -159,5 +307,201 @@ def main():
     ################ Main process ################
 
 
+def Project_samples(input_file_path: str, out_dir: str, model_path: str,
+                    chunk_size: int, logger: Logger) -> None:
+    """
+    Project samples in input file onto fitted PCA model.
+    Input file is read chunk by chunk, so reference data is not needed.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to input file. (SNP x sample)
+    out_dir: str
+        Directory to output PCA_Score_projected.txt.
+    model_path: str
+        Path to PCA_Model.npz saved by this script.
+    chunk_size: int
+        Chunk size(lines) to read at one time.
+    logger: Logger
+        Logger of this script.
+    """
+    logger.info("Loading PCA model...")
+    try:
+        model: Dict[str, np.ndarray] = Load_model(model_path)
+        reader = pd.read_table(
+            input_file_path, index_col=0, chunksize=chunk_size)
+    except FileNotFoundError as fene:
+        logger.info("Error!")
+        logger.info(f"File: {fene.filename} does not exisit.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    snp_index: Dict[str, int] = \
+        {snp: i for i, snp in enumerate(model["snp_ids"].tolist())}
+
+    logger.info("Projecting samples...")
+    scores: np.ndarray = None
+    samples: List[str] = []
+    n_used: int = 0
+    for chunk in reader:
+        chunk.index = chunk.index.astype(str)
+        if scores is None:
+            samples = chunk.columns.tolist()
+            scores = Init_scores(model, len(samples))
+        n_used += Project_chunk(chunk, model, snp_index, scores)
+    logger.info(f"{n_used} of {len(snp_index)} SNPs in the model were used.")
+    if n_used < len(snp_index):
+        logger.info("SNPs not in input file were regarded as mean.")
+
+    PCs: List[str] = [f"PC{x}" for x in range(1, len(model["components"])+1)]
+    pca_score: pd.DataFrame = pd.DataFrame(
+        data=scores, columns=PCs, index=samples)
+    pca_score.to_csv(f"{out_dir}/PCA_Score_projected.txt", sep="\t")
+
+
+def Read_standardized_chunks(input_file_path: str, impute: str,
+                             chunk_size: int, logger: Logger):
+    """
+    Read input file chunk by chunk, fill NA and standardize each SNP.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to input file. (SNP x sample)
+    impute: str
+        "mean", "mode" or False.
+    chunk_size: int
+        Chunk size(lines) to read at one time.
+    logger: Logger
+        Logger of this script.
+
+    Yields:
+    ----------
+    chunk: pd.DataFrame
+        Raw chunk. (index is SNP ID)
+    z: np.ndarray
+        Standardized genotypes of polymorphic SNPs. (SNP x sample)
+    snp_mean, snp_sd: np.ndarray
+        Mean and standard deviation of polymorphic SNPs.
+    polymorphic: np.ndarray
+        Boolean array, True if the SNP was kept.
+    filled_mask: np.ndarray
+        Boolean matrix, True where NA was filled.
+    """
+    try:
+        reader = pd.read_table(
+            input_file_path, index_col=0, chunksize=chunk_size)
+        for chunk in reader:
+            values: np.ndarray = chunk.to_numpy(dtype="float64")
+            filled_mask: np.ndarray = np.zeros(values.shape, dtype=bool)
+            if impute:
+                values, filled_mask = Impute_rows(values, impute)
+            if np.isnan(values).any():
+                logger.info("Error!")
+                logger.info("Maybe your input file contains NA.")
+                logger.info("Please imputate your file before PCA, \
+or use --impute option.")
+                logger.info("=======================================================")
+                sys.exit(1)
+            yield (chunk,) + Standardize_chunk(values) + (filled_mask,)
+    except FileNotFoundError as fene:
+        logger.info("Error!")
+        logger.info(f"File: {fene.filename} does not exisit.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+
+
+def Out_of_core_PCA(input_file_path: str, out_dir: str, n_components: int,
+                    impute: str, chunk_size: int, logger: Logger) -> None:
+    """
+    PCA without loading whole input file.
+    Gram matrix of samples is accumulated chunk by chunk of SNPs,
+    and the loadings for PCA_Model.npz are computed in the second pass.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to input file. (SNP x sample)
+    out_dir: str
+        Directory to output files.
+    n_components: int
+        Number of principal components to keep. None means all.
+    impute: str
+        "mean", "mode" or False.
+    chunk_size: int
+        Chunk size(lines) to read at one time.
+    logger: Logger
+        Logger of this script.
+    """
+    logger.info("Accumulating Gram matrix...")
+    gram: np.ndarray = None
+    samples: List[str] = []
+    snp_ids: List[str] = []
+    snp_means: List[np.ndarray] = []
+    snp_sds: List[np.ndarray] = []
+    imputed_samples: np.ndarray = None
+    n_monomorphic: int = 0
+    with open(f"{out_dir}/Imputed_SNPs.txt" if impute else os.devnull,
+              "w") as imputed_SNPs_file:
+        imputed_SNPs_file.write("ID\tN_IMPUTED\n")
+        for chunk, z, snp_mean, snp_sd, polymorphic, filled_mask in \
+            Read_standardized_chunks(
+                input_file_path, impute, chunk_size, logger):
+            if gram is None:
+                samples = chunk.columns.tolist()
+                gram = np.zeros((len(samples), len(samples)))
+                imputed_samples = np.zeros(len(samples), dtype="int64")
+            gram += z.T @ z
+            snp_ids += chunk.index.astype(str)[polymorphic].tolist()
+            snp_means.append(snp_mean)
+            snp_sds.append(snp_sd)
+            n_monomorphic += int((~polymorphic).sum())
+            imputed_samples += filled_mask.sum(axis=0)
+            imputed: np.ndarray = filled_mask.sum(axis=1)
+            for snp, n in zip(chunk.index[imputed > 0], imputed[imputed > 0]):
+                imputed_SNPs_file.write(f"{snp}\t{n}\n")
+    if impute:
+        pd.DataFrame({"N_IMPUTED": imputed_samples}, index=samples).to_csv(
+            f"{out_dir}/Imputed_samples.txt", sep="\t", index_label="sample")
+        logger.info(f"{imputed_samples.sum()} NA were filled with {impute}.")
+    if n_monomorphic:
+        logger.info(f"{n_monomorphic} SNPs were monomorphic, \
+and they were removed.")
+
+    logger.info("Performing Principal Component Analysis ...")
+    n_PCs: int = min(n_components or len(samples), len(samples), len(snp_ids))
+    scores, evr, eigenvectors, singular_values = Gram_eigen(gram, n_PCs)
+    PCs: List[str] = [f"PC{x}" for x in range(1, n_PCs+1)]
+    pd.DataFrame(data=scores, columns=PCs, index=samples).to_csv(
+        f"{out_dir}/PCA_Score.txt", sep="\t")
+    pd.DataFrame(
+        data=evr, columns=["explained_variance_ratio"], index=PCs).to_csv(
+        f"{out_dir}/Expl_Var_Ratio.txt", sep="\t")
+
+    # 負荷量はSNPごとに求まるので、もう一度チャンクごとに読む。
+    logger.info("Computing loadings for PCA model...")
+    components: np.ndarray = np.zeros((n_PCs, len(snp_ids)), dtype="float32")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse_sv: np.ndarray = \
+            np.where(singular_values > 0, 1 / singular_values, 0.0)
+    position: int = 0
+    for _, z, _, _, _, _ in Read_standardized_chunks(
+            input_file_path, impute, chunk_size, logger):
+        components[:, position:position+len(z)] = \
+            (z @ eigenvectors).T * inverse_sv[:, None]
+        position += len(z)
+
+    logger.info("Saving PCA model...")
+    Save_model(f"{out_dir}/PCA_Model.npz",
+               components=components,
+               snp_mean=np.concatenate(snp_means),
+               snp_sd=np.concatenate(snp_sds),
+               pca_mean=np.zeros(len(snp_ids)),
+               snp_ids=snp_ids,
+               explained_variance_ratio=evr)
+
+
 if __name__=="__main__":
     main()
\ No newline at end of file
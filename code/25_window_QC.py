@@ -0,0 +1,221 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+Python >= 3.7
+numpy==1.20.1
+pandas==1.2.2
+matplotlib==3.3.4
+seaborn==0.11.1
+
+25_window_QC.py
+    -i (--input-file-path)
+    -od (--output-dir)
+    -w (--window-sizes)
+    -c (--chunk-size)
+
+10_after_imputation.pyの--site-statsで書き出したSNPごとの
+MAF、NAの割合、ヘテロ接合度を、ゲノム上のウィンドウごとに集計して図にする。
+フィルタリングの閾値を決める前に、ゲノム全体の傾向を見るためのスクリプト。
+
+入力は一度だけチャンクごとに読み、染色体ごとの累積和(Window_prefix.npz)にする。
+ウィンドウの平均は両端の累積和の差から求めるので、
+ウィンドウの大きさをいくつ指定しても入力を読み直さない。
+Window_prefix.npzを--input-file-pathに指定すると、入力を読まずに
+別のウィンドウの大きさで集計し直せる。
+
+ウィンドウの大きさごとに以下を出力する。
+    Window_QC_<size>.txt    ウィンドウごとのSNP数と各統計量の平均
+    Window_QC_<size>.png    ゲノム上の各統計量の図
+'''
+
+import argparse
+import datetime
+from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+import os
+import sys
+import time
+from typing import Dict, List
+
+import matplotlib
+matplotlib.use("Agg") # 画面の無い環境でも図を書き出す
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_utils import Runtime_counter
+from my_window import Build_prefix, Save_prefix, Load_prefix, Window_summary
+
+
+# 図に描く列と縦軸の名前
+PLOT_COLUMNS: Dict[str, str] = {
+    "MEAN_MAF": "MAF",
+    "MEAN_NA_RATE": "NA rate",
+    "MEAN_HET_RATE": "Heterozygosity",
+    "N_SITES": "SNPs"}
+
+
+def Plot_windows(summary: pd.DataFrame, window_size: int, path: str) -> None:
+    """
+    Plot window summary along the genome.
+
+    Arguments:
+    ----------
+    summary: pd.DataFrame
+        Window summary got from Window_summary function.
+    window_size: int
+        Size(bp) of window. (used for title)
+    path: str
+        Path to output figure.
+    """
+    sns.set_style("whitegrid")
+    colors: list = sns.color_palette("deep", 2)
+    fig, axes = plt.subplots(
+        len(PLOT_COLUMNS), 1, sharex=True, figsize=(14, 2.5 * len(PLOT_COLUMNS)))
+    # 染色体をつなげて横軸にする
+    offset: int = 0
+    ticks: List[float] = []
+    for i, (contig, table) in enumerate(summary.groupby("CHROM", sort=True)):
+        x: np.ndarray = offset + (table["START"].to_numpy()
+                                  + table["END"].to_numpy()) / 2
+        for ax, column in zip(axes, PLOT_COLUMNS):
+            ax.scatter(x, table[column], s=4, color=colors[i % 2])
+        ticks.append(offset + table["END"].max() / 2)
+        offset += table["END"].max()
+    for ax, label in zip(axes, PLOT_COLUMNS.values()):
+        ax.set_ylabel(label)
+    axes[-1].set_xticks(ticks)
+    axes[-1].set_xticklabels(sorted(summary["CHROM"].unique()))
+    axes[-1].set_xlabel("Chromosome code")
+    axes[0].set_title(f"Window size = {window_size:,} bp")
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+
+def main():
+    ################ Setting command line arguments ################
+    parser=argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    # 入力ファイルのパス(必須)
+    parser.add_argument(
+        "-i", "--input-file-path", type=str, action="store",
+        dest="inputFilePath", required=True,
+        help="Path to output of --site-stats of 10_after_imputation.py, \
+        or Window_prefix.npz.")
+
+    # ファイルの出力先(必須)
+    parser.add_argument(
+        "-od", "--output-dir", type=str, action="store",
+        dest="output_dir", required=True, help="Directory to output files.")
+
+    # ウィンドウの大きさ(bp)
+    # [100000:1000000]のように:区切りで複数指定できる
+    parser.add_argument(
+        "-w", "--window-sizes", type=str, action="store",
+        dest="window_sizes", default="[1000000]",
+        help="Window sizes(bp) enclosed in []. e.g. [100000:1000000] \
+        (default=[1000000])")
+
+    # 一度に読み込む行数
+    parser.add_argument(
+        "-c", "--chunk-size", type=int, action="store",
+        dest="chunk_size", default=1000000,
+        help="Chunk size(lines) to read at one time. (default=1000000)")
+
+    args = parser.parse_args()
+    input_file_path: str = args.inputFilePath
+    output_dir: str = args.output_dir
+    chunk_size: int = args.chunk_size
+
+    # []つきで受け取る
+    if not args.window_sizes.startswith("[") \
+        or not args.window_sizes.endswith("]"):
+        print("Argument --window-sizes must be enclosed in []")
+        sys.exit(1)
+    try:
+        window_sizes: List[int] = \
+            [int(size) for size in args.window_sizes[1:-1].split(":")]
+    except ValueError:
+        print("Window sizes must be integers.")
+        sys.exit(1)
+    if min(window_sizes) < 1:
+        print("Window sizes must be 1 or more.")
+        sys.exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+    ################ End of setting command line arguments ################
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    fh = FileHandler(
+        filename=__file__ + datetime.datetime.now().isoformat() +".log")
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    ################ End of setting of logger ################
+
+
+    ################ Main process ################
+    start: float = time.time()
+
+    logger.info(__file__ + f"\n\
+        \t\t\t\t--input_file_path {input_file_path}\n\
+        \t\t\t\t--output-dir {output_dir}\n\
+        \t\t\t\t--window-sizes {window_sizes}\n\
+        \t\t\t\t--chunk-size {chunk_size}\n")
+    logger.info("=======================================================")
+    logger.info("Start program...")
+
+    try:
+        if input_file_path.endswith(".npz"):
+            prefix: Dict[str, np.ndarray] = Load_prefix(input_file_path)
+        else:
+            # 入力は一度だけ読み、累積和を保存しておく
+            prefix = Build_prefix(input_file_path, chunk_size)
+            Save_prefix(os.path.join(output_dir, "Window_prefix.npz"), prefix)
+    except FileNotFoundError as fene:
+        logger.info("Error!")
+        logger.info(f"File: {fene.filename} does not exisit.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    except ValueError as e:
+        logger.info("Error!")
+        logger.info(f"{e}")
+        logger.info("Input must be output of --site-stats of \
+            10_after_imputation.py.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    logger.info(f"{len(prefix['pos'])} SNPs in {len(prefix['contigs'])} \
+        chromosomes were loaded.")
+
+    for window_size in window_sizes:
+        summary: pd.DataFrame = Window_summary(prefix, window_size)
+        summary.to_csv(
+            os.path.join(output_dir, f"Window_QC_{window_size}.txt"),
+            sep="\t", index=False, na_rep="NA", float_format="%.6g")
+        if len(summary):
+            Plot_windows(summary, window_size, os.path.join(
+                output_dir, f"Window_QC_{window_size}.png"))
+        logger.info(f"Window size {window_size}: {len(summary)} windows.")
+
+    end: float = time.time()
+    logger.info("Success processing!")
+    logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+    logger.info(f"Window summaries were written in {output_dir} .")
+    logger.info("=======================================================")
+    ################ End of main process ################
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,382 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+Python >= 3.7
+numpy==1.20.1
+pandas==1.2.2
+scipy==1.6.1
+
+30_GWAS.py
+    -i (--input-file-path)
+    -ib (--input-binary)
+    -ph (--phenotype-file-path)
+    -pn (--phenotype-name)
+    -cv (--covariate-file-path)
+    -cc (--covariate-columns)
+    -o (--output-file-path)
+    -b (--block-size)
+
+10_after_imputation.pyの出力(テキストまたは--output-binaryのバイナリ)を
+SNPのブロックごとに読み込み、SNPごとの単回帰(共変量があれば重回帰)によるGWASを行う。
+ブロック内の全SNPを行列演算でまとめて計算し、結果を逐次書き出すため、
+メモリ使用量はブロックサイズで決まる。
+共変量には20_PCA.pyの主成分スコア(PCA_Score.txt)などが使える。
+
+表現型ファイルの想定 (1列目がサンプル名)
+sample      trait1    trait2
+sample1     10.2      1
+sample2     12.5      0
+
+欠損しているジェノタイプはそのSNPの平均で補完する。
+'''
+
+
+import argparse
+import datetime
+from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+import os
+import sys
+import time
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_store import Load_store
+from my_utils import Runtime_counter
+
+
+# 10_after_imputation.pyのテキスト出力でサンプル以外の列
+SITE_FIELDS: List[str] = \
+    ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT"]
+
+
+def Residualize(Q: np.ndarray, X: np.ndarray) -> np.ndarray:
+    """
+    Remove the effect of covariates from X.
+
+    Arguments:
+    ----------
+    Q: np.ndarray
+        Orthonormal basis of covariates (including intercept). (sample x k)
+    X: np.ndarray
+        Vector or matrix to be residualized. (sample x m)
+
+    Returns:
+    ----------
+    residual: np.ndarray
+        X - Q Q^T X
+    """
+    return X - Q @ (Q.T @ X)
+
+
+def Block_regression(G: np.ndarray, y_r: np.ndarray, Q: np.ndarray,
+                     df: int) -> Tuple[np.ndarray, ...]:
+    """
+    Linear regression of phenotype on each SNP in a block at once.
+
+    Arguments:
+    ----------
+    G: np.ndarray
+        Genotypes of a block. NA is allowed. (sample x SNP)
+    y_r: np.ndarray
+        Phenotype residualized by covariates. (sample)
+    Q: np.ndarray
+        Orthonormal basis of covariates (including intercept). (sample x k)
+    df: int
+        Degree of freedom of residuals. (sample - k - 1)
+
+    Returns:
+    ----------
+    beta, se, t, p, n_miss: np.ndarray
+        Effect size, standard error, t value, p value
+        and number of imputed genotypes of each SNP.
+    """
+    # 欠損値はSNPごとの平均で補完する。
+    missing: np.ndarray = np.isnan(G)
+    n_miss: np.ndarray = missing.sum(axis=0)
+    if n_miss.any():
+        with np.errstate(invalid="ignore"):
+            G = np.where(missing, np.nanmean(G, axis=0), G)
+        G = np.nan_to_num(G, nan=0.0)
+    G_r: np.ndarray = Residualize(Q, G)
+
+    sxx: np.ndarray = np.einsum("ij,ij->j", G_r, G_r)
+    sxy: np.ndarray = G_r.T @ y_r
+    yy: float = float(y_r @ y_r)
+    # 多型の無いSNPはsxx = 0(丸め誤差で0に近い値)となるので、NAにする。
+    sxx = np.where(sxx > 1e-8 * len(y_r), sxx, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta: np.ndarray = sxy / sxx
+        rss: np.ndarray = np.maximum(yy - beta * sxy, 0.0)
+        se: np.ndarray = np.sqrt(rss / df / sxx)
+        t: np.ndarray = beta / se
+    p: np.ndarray = 2 * stats.t.sf(np.abs(t), df)
+    return beta, se, t, p, n_miss
+
+
+def Read_text_blocks(input_file_path: str, samples: List[str],
+                     block_size: int
+                     ) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    Read numeric text output of 10_after_imputation.py block by block.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to input file.
+    samples: List[str]
+        Samples to be read.
+    block_size: int
+        Number of SNPs in a block.
+
+    Yields:
+    ----------
+    sites: pd.DataFrame
+        Site columns in SITE_FIELDS. (CHROM, POS, ID etc.)
+        Genotypes of samples not in samples are not read.
+    G: np.ndarray
+        Genotypes of the block. (sample x SNP)
+    """
+    header: List[str] = \
+        pd.read_table(input_file_path, nrows=0).columns.tolist()
+    site_columns: List[str] = [c for c in header if c in SITE_FIELDS]
+    reader = pd.read_table(
+        input_file_path, usecols=site_columns + samples,
+        dtype={s: "float64" for s in samples}, chunksize=block_size)
+    for chunk in reader:
+        yield chunk[site_columns], chunk[samples].to_numpy().T
+
+
+def Read_binary_blocks(input_binary: str, samples: List[str],
+                       block_size: int
+                       ) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    Read binary store of 10_after_imputation.py block by block.
+
+    Arguments:
+    ----------
+    input_binary: str
+        Path to binary store.
+    samples: List[str]
+        Samples to be read.
+    block_size: int
+        Number of SNPs in a block.
+
+    Yields:
+    ----------
+    sites: pd.DataFrame
+        CHROM, POS, ID of the block.
+    G: np.ndarray
+        Genotypes of the block. (sample x SNP)
+    """
+    matrix, meta = Load_store(input_binary)
+    sample_index: np.ndarray = \
+        np.array([meta["samples"].index(s) for s in samples])
+    reader = pd.read_table(
+        input_binary + ".sites", header=None, names=["CHROM", "POS", "ID"],
+        dtype=str, chunksize=block_size)
+    start: int = 0
+    for sites in reader:
+        end: int = start + len(sites)
+        block: np.ndarray = matrix[start:end][:, sample_index]
+        yield sites, block.astype("float64").T
+        start = end
+
+
+def main():
+    ################ Setting command line arguments ################
+    parser=argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    # 入力ファイルのパス
+    parser.add_argument(
+        "-i", "--input-file-path", type=str, action="store",
+        dest="inputFilePath", default=False,
+        help="Path to input file. (numeric output of 10_after_imputation.py)")
+
+    # 入力バイナリのパス
+    parser.add_argument(
+        "-ib", "--input-binary", type=str, action="store",
+        dest="input_binary", default=False,
+        help="Path to binary store written by 10_after_imputation.py \
+        --output-binary. Used instead of --input-file-path.")
+
+    # 表現型ファイルのパス(必須)
+    parser.add_argument(
+        "-ph", "--phenotype-file-path", type=str, action="store",
+        dest="phenotype_file_path", required=True,
+        help="Path to phenotype file. First column is sample name.")
+
+    # 表現型の列名
+    # (デフォルトは1列目の表現型)
+    parser.add_argument(
+        "-pn", "--phenotype-name", type=str, action="store",
+        dest="phenotype_name", default=False,
+        help="Column name of phenotype. default=first phenotype column")
+
+    # 共変量ファイルのパス
+    # (デフォルトはFalse、共変量なし)
+    parser.add_argument(
+        "-cv", "--covariate-file-path", type=str, action="store",
+        dest="covariate_file_path", default=False,
+        help="Path to covariate file. First column is sample name. \
+        (e.g. PCA_Score.txt of 20_PCA.py) default=False")
+
+    # 共変量の列名
+    # (デフォルトはFalse、全ての列)
+    parser.add_argument(
+        "-cc", "--covariate-columns", type=str, action="store",
+        dest="covariate_columns", default=False,
+        help="Columns of covariate file to use, separated by colons(:) \
+        and enclosed in []. (e.g. [PC1:PC2:PC3]) default=all columns")
+
+    # 出力ファイルのパス(必須)
+    parser.add_argument(
+        "-o", "--output-file-path", type=str, action="store",
+        dest="outputFilePath", required=True, help="Path to output file.")
+
+    # ブロックサイズ(一度に計算するSNP数)
+    parser.add_argument(
+        "-b", "--block-size", type=int, action="store",
+        dest="block_size", default=10000,
+        help="Number of SNPs to compute at one time. (default=10000)")
+
+    args = parser.parse_args()
+    input_file_path: str = args.inputFilePath
+    input_binary: str = args.input_binary
+    phenotype_file_path: str = args.phenotype_file_path
+    phenotype_name: str = args.phenotype_name
+    covariate_file_path: str = args.covariate_file_path
+    output_file_path: str = args.outputFilePath
+    block_size: int = args.block_size
+
+    if bool(input_file_path) == bool(input_binary):
+        print("Specify either --input-file-path or --input-binary.")
+        sys.exit(1)
+
+    # []つきで受け取る
+    if args.covariate_columns:
+        if not args.covariate_columns.startswith("[") \
+            or not args.covariate_columns.endswith("]"):
+            print("Argument --covariate-columns must be enclosed in []")
+            sys.exit(1)
+    covariate_columns: List[str] = \
+        args.covariate_columns[1:-1].split(":") \
+        if args.covariate_columns else []
+    ################ End of setting command line arguments ################
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    fh = FileHandler(
+        filename=__file__ + datetime.datetime.now().isoformat() +".log")
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    ################ End of setting of logger ################
+
+
+    ################ Main process ################
+    start: float = time.time()
+
+    logger.info(__file__ + f"\n\
+        \t\t\t\t--input_file_path {input_file_path}\n\
+        \t\t\t\t--input-binary {input_binary}\n\
+        \t\t\t\t--phenotype-file-path {phenotype_file_path}\n\
+        \t\t\t\t--phenotype-name {phenotype_name}\n\
+        \t\t\t\t--covariate-file-path {covariate_file_path}\n\
+        \t\t\t\t--covariate-columns {covariate_columns}\n\
+        \t\t\t\t--output_file_path {output_file_path}\n\
+        \t\t\t\t--block-size {block_size}\n")
+    logger.info("=======================================================")
+    logger.info("Start program...")
+
+    try:
+        # 表現型、共変量、ジェノタイプのサンプルを揃える
+        pheno: pd.DataFrame = pd.read_table(phenotype_file_path, index_col=0)
+        pheno.index = pheno.index.astype(str)
+        y: pd.Series = \
+            pheno[phenotype_name] if phenotype_name else pheno.iloc[:, 0]
+        y = y.dropna()
+        if covariate_file_path:
+            covar: pd.DataFrame = \
+                pd.read_table(covariate_file_path, index_col=0)
+            covar.index = covar.index.astype(str)
+            if covariate_columns:
+                covar = covar[covariate_columns]
+            covar = covar.dropna()
+        else:
+            covar = pd.DataFrame(index=y.index)
+        if input_binary:
+            _, meta = Load_store(input_binary)
+            geno_samples: List[str] = meta["samples"]
+        else:
+            geno_samples = [
+                c for c in pd.read_table(input_file_path, nrows=0).columns
+                if c not in SITE_FIELDS]
+    except FileNotFoundError as fene:
+        logger.info("Error!")
+        logger.info(f"File: {fene.filename} does not exisit.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    except KeyError as ke:
+        logger.info("Error!")
+        logger.info(f"Column: {ke} does not exist.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+
+    samples: List[str] = [s for s in geno_samples
+                          if s in y.index and s in covar.index]
+    logger.info(f"{len(samples)} samples were used.")
+
+    # 切片と共変量の正規直交基底
+    C: np.ndarray = np.column_stack(
+        [np.ones(len(samples)), covar.loc[samples].to_numpy(dtype="float64")])
+    Q, _ = np.linalg.qr(C)
+    df: int = len(samples) - C.shape[1] - 1
+    if df < 1:
+        logger.info("Error!")
+        logger.info("Number of samples is too small for the covariates.")
+        logger.info("Suspend the process.")
+        logger.info("=======================================================")
+        sys.exit(1)
+    y_r: np.ndarray = Residualize(Q, y.loc[samples].to_numpy(dtype="float64"))
+
+    logger.info("Performing GWAS...")
+    blocks = Read_binary_blocks(input_binary, samples, block_size) \
+        if input_binary else \
+        Read_text_blocks(input_file_path, samples, block_size)
+    count_SNPs: int = 0
+    header: bool = True
+    with open(output_file_path, "w") as output_file:
+        for sites, G in blocks:
+            beta, se, t, p, n_miss = Block_regression(G, y_r, Q, df)
+            result: pd.DataFrame = sites.reset_index(drop=True).assign(
+                N_MISS=n_miss, BETA=beta, SE=se, T=t, P=p)
+            result.to_csv(output_file, sep="\t", index=False,
+                          header=header, na_rep="NA")
+            header = False
+            count_SNPs += len(result)
+
+    end: float = time.time()
+    logger.info("Success processing!")
+    logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+    logger.info(f"{count_SNPs} SNPs were written in your {output_file_path} .")
+    logger.info("=======================================================")
+    ################ End of main process ################
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,414 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+Python >= 3.7
+
+90_batch.py
+    -s (--stage)
+    -d (--input-dir)
+    -p (--pattern)
+    -ma (--manifest)
+    -od (--output-dir)
+    -j (--jobs)
+    -io (--max-io)
+    -mf (--metrics-file)
+    上記以外の引数は00_before_imputation.py、10_after_imputation.pyの引数
+    (-i, -oは除く)としてそのまま渡す。
+    -s, -d, -p, -jは値をつなげて書けるので(-ss xは-s sになる)、
+    ステージの短い引数はこれらの文字で始めない。
+
+複数のVCFを00_before_imputation.pyまたは10_after_imputation.pyで
+並列に処理するスクリプト。
+入力はディレクトリ(--input-dir、--patternに一致するファイル)か、
+1行に1ファイルのマニフェスト(--manifest、入力パス[タブ出力パス])で指定する。
+出力パスを省略した場合は<output-dir>/<入力名から.vcf, .vcf.gzを除いたもの>
+に00では.GT.vcf、10では.txtをつけたものになる。
+出力パスが重なる場合(別のディレクトリにある同じ名前の入力など)は処理しない。
+
+--convert-rule、--remove-fieldsなどの共通の設定は最初に一度だけ解析し、
+CPUの数(--jobs)とI/Oの数(--max-io)の小さい方を上限として並列に処理する。
+--max-memoryは同時に処理するファイルで等分する。
+--output-binary、--output-parquet、--group-output、--site-statsの値は使わず、
+ファイルごとに<output>.bin、<output>.parquet、<output>.groups.txt、
+<output>.site_stats.txtに書き出す。
+ログはバッチ全体で1つのファイル(<output-dir>/batch_<日時>.log、
+行頭に入力ファイル名)にまとめ、
+ファイルごとの処理結果(SNP数、除いたSNP数、処理時間など)は
+--metrics-fileにまとめて書き出す。
+'''
+
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import glob
+import importlib
+from logging import getLogger, Logger, StreamHandler, FileHandler, INFO, Formatter
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_memory import Io_buffer_size
+from my_utils import Runtime_counter
+
+
+STAGES: Dict[str, Tuple[str, str]] = {
+    "00": ("00_before_imputation", ".GT.vcf"),
+    "10": ("10_after_imputation", ".txt")}
+# ファイルごとに書き出す出力(設定名, 拡張子)
+PER_FILE_OUTPUTS: List[Tuple[str, str]] = [
+    ("output_binary", ".bin"),
+    ("output_parquet", ".parquet"),
+    ("group_output", ".groups.txt"),
+    ("site_stats", ".site_stats.txt")]
+
+# ワーカーのログを親プロセスに送るキュー(Init_workerで設定する)
+log_queue: Any = None
+
+
+def Read_manifest(manifest_path: str) -> List[Tuple[str, str]]:
+    """
+    Read input (and output) paths from manifest.
+
+    Arguments:
+    ----------
+    manifest_path: str
+        Path to manifest. One input per line, (input[\\toutput])
+        Empty lines and lines starting with # are ignored.
+
+    Returns:
+    ----------
+    jobs: List[Tuple[str, str]]
+        (input, output) of each file. output is "" if not specified.
+    """
+    jobs: List[Tuple[str, str]] = []
+    with open(manifest_path, "r") as manifest:
+        for line in manifest:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("#"):
+                continue
+            fields: List[str] = line.split("\t")
+            jobs.append((fields[0], fields[1] if len(fields) > 1 else ""))
+    return jobs
+
+
+def Output_path(input_path: str, output_dir: str, suffix: str) -> str:
+    """
+    Make default output path from input path.
+
+    Arguments:
+    ----------
+    input_path: str
+        Path to input VCF.
+    output_dir: str
+        Directory of outputs.
+    suffix: str
+        Suffix of the stage. (e.g. ".txt")
+
+    Returns:
+    ----------
+    output_path: str
+        <output_dir>/<input name without .vcf(.gz)><suffix>
+    """
+    name: str = os.path.basename(input_path)
+    for extension in (".gz", ".vcf"):
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    return os.path.join(output_dir, name + suffix)
+
+
+def Job_settings(settings: Dict[str, Any], input_path: str,
+                 output_path: str, n_workers: int) -> Dict[str, Any]:
+    """
+    Make settings of one file from shared settings.
+
+    Arguments:
+    ----------
+    settings: Dict[str, Any]
+        Shared settings got from Parse_settings function of the stage.
+    input_path, output_path: str
+        Paths of the file.
+    n_workers: int
+        Number of files processed at once.
+
+    Returns:
+    ----------
+    job_settings: Dict[str, Any]
+        Settings given to Run function of the stage.
+    """
+    job_settings: Dict[str, Any] = dict(settings)
+    job_settings["input_file_path"] = input_path
+    job_settings["output_file_path"] = output_path
+    for key, extension in PER_FILE_OUTPUTS:
+        if job_settings.get(key):
+            job_settings[key] = output_path + extension
+    # メモリの上限は同時に処理するファイルで等分する
+    if job_settings.get("max_memory"):
+        job_settings["max_memory"] = \
+            max(1, job_settings["max_memory"] // n_workers)
+        job_settings["buffer_size"] = \
+            Io_buffer_size(job_settings["max_memory"])
+    return job_settings
+
+
+def Init_worker(queue: Any) -> None:
+    """
+    Set the queue to send log records to the main process.
+
+    Arguments:
+    ----------
+    queue: multiprocessing.Queue
+        Queue read by QueueListener of the main process.
+    """
+    global log_queue
+    log_queue = queue
+
+
+def Run_job(module_name: str, job_settings: Dict[str, Any]
+            ) -> Tuple[str, Dict[str, Any]]:
+    """
+    Process one file in a worker process.
+
+    Arguments:
+    ----------
+    module_name: str
+        Module name of the stage. (e.g. "10_after_imputation")
+    job_settings: Dict[str, Any]
+        Settings got from Job_settings function.
+
+    Returns:
+    ----------
+    status: str
+        "OK" or "FAILED".
+    metrics: Dict[str, Any]
+        Metrics returned by Run function of the stage.
+    """
+    input_path: str = job_settings["input_file_path"]
+    logger: Logger = getLogger(f"{module_name}.{input_path}")
+    logger.setLevel(INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(QueueHandler(log_queue))
+
+    start: float = time.time()
+    try:
+        stage = importlib.import_module(module_name)
+        return "OK", stage.Run(job_settings, logger)
+    except SystemExit:
+        # ステージ側でエラーを記録してsys.exit(1)した場合
+        pass
+    except Exception as e:
+        logger.info("Error!")
+        logger.info(f"{type(e).__name__}: {e}")
+    end: float = time.time()
+    return "FAILED", {"runtime": Runtime_counter(start, end)}
+
+
+def main():
+    ################ Setting command line arguments ################
+    # ステージの引数(-mM, -memなど)を略記と誤認しないようにする
+    parser=argparse.ArgumentParser(
+        description=__doc__, allow_abbrev=False,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    # 処理するステージ(必須)
+    parser.add_argument(
+        "-s", "--stage", type=str, action="store", dest="stage",
+        required=True, choices=list(STAGES),
+        help="00: 00_before_imputation.py, 10: 10_after_imputation.py")
+
+    # 入力ファイルのディレクトリ
+    parser.add_argument(
+        "-d", "--input-dir", type=str, action="store", dest="input_dir",
+        default=None, help="Directory of input VCFs.")
+
+    # ディレクトリから入力ファイルを選ぶパターン
+    parser.add_argument(
+        "-p", "--pattern", type=str, action="store", dest="pattern",
+        default="*.vcf",
+        help="Pattern of input files in --input-dir. (default=*.vcf)")
+
+    # 入力(と出力)のパスを書いたファイル
+    parser.add_argument(
+        "-ma", "--manifest", type=str, action="store", dest="manifest",
+        default=None, help="File of input paths. (input[\\toutput] per line)")
+
+    # 出力ディレクトリ(必須)
+    parser.add_argument(
+        "-od", "--output-dir", type=str, action="store", dest="output_dir",
+        required=True, help="Directory of outputs and metrics.")
+
+    # 同時に処理するファイルの数(CPU)
+    parser.add_argument(
+        "-j", "--jobs", type=int, action="store", dest="jobs",
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. (default=number of CPUs)")
+
+    # 同時に読み書きするファイルの数(I/O)
+    parser.add_argument(
+        "-io", "--max-io", type=int, action="store", dest="max_io",
+        default=4, help="Maximum number of files read at once. (default=4)")
+
+    # 処理結果のまとめ
+    parser.add_argument(
+        "-mf", "--metrics-file", type=str, action="store", dest="metrics_file",
+        default=None,
+        help="Path to metrics summary. \
+        (default=<output-dir>/batch_metrics.txt)")
+
+    args, stage_args = parser.parse_known_args()
+    stage: str = args.stage
+    input_dir: str = args.input_dir
+    pattern: str = args.pattern
+    manifest: str = args.manifest
+    output_dir: str = args.output_dir
+    jobs: int = args.jobs
+    max_io: int = args.max_io
+    metrics_file: str = args.metrics_file \
+        or os.path.join(output_dir, "batch_metrics.txt")
+
+    if bool(input_dir) == bool(manifest):
+        print("Specify either --input-dir or --manifest.")
+        sys.exit(1)
+    if jobs < 1 or max_io < 1:
+        print("--jobs and --max-io must be 1 or more.")
+        sys.exit(1)
+    if "-i" in stage_args or "--input-file-path" in stage_args \
+        or "-o" in stage_args or "--output-file-path" in stage_args:
+        print("-i and -o are given by --input-dir or --manifest.")
+        sys.exit(1)
+
+    module_name, suffix = STAGES[stage]
+    module = importlib.import_module(module_name)
+    # 共通の設定は一度だけ解析する(-i, -oはファイルごとに置き換える)
+    stage_parser: argparse.ArgumentParser = module.Build_parser()
+    stage_parser.prog = f"{os.path.basename(__file__)} -s {stage}"
+    settings: Dict[str, Any] = module.Parse_settings(
+        stage_parser.parse_args(["-i", "-", "-o", "-"] + stage_args))
+
+    if manifest:
+        try:
+            file_jobs: List[Tuple[str, str]] = Read_manifest(manifest)
+        except FileNotFoundError:
+            print(f"File: {manifest} does not exisit.")
+            sys.exit(1)
+    else:
+        file_jobs = [(path, "") for path in
+                     sorted(glob.glob(os.path.join(input_dir, pattern)))]
+    if not file_jobs:
+        print("No input files were found.")
+        sys.exit(1)
+    file_jobs = [(i, o or Output_path(i, output_dir, suffix))
+                 for i, o in file_jobs]
+    # 出力が重なると後のファイルが先のファイルを上書きしてしまう
+    # (別のディレクトリにある同じ名前の入力など)
+    outputs: List[str] = [os.path.abspath(o) for _, o in file_jobs]
+    duplicated: List[str] = sorted(
+        o for o, n in Counter(outputs).items() if n > 1)
+    if duplicated:
+        print("Some inputs have the same output path. \
+Give output paths in --manifest.")
+        for o in duplicated:
+            print(f"    {o}: " + ", ".join(
+                i for (i, _), path in zip(file_jobs, outputs) if path == o))
+        sys.exit(1)
+    n_workers: int = min(jobs, max_io, len(file_jobs))
+    os.makedirs(output_dir, exist_ok=True)
+    ################ End of setting command line arguments ################
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    # batch_metrics.txtと同じく出力先に書き出す
+    fh = FileHandler(filename=os.path.join(
+        output_dir, "batch_" + datetime.datetime.now().isoformat() + ".log"))
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    # ワーカーのログは入力ファイル名をつけて同じファイルに書き出す
+    job_formatter = Formatter("%(asctime)s [%(name)s] %(message)s")
+    job_sh = StreamHandler()
+    job_sh.setFormatter(job_formatter)
+    job_fh = FileHandler(filename=fh.baseFilename)
+    job_fh.setFormatter(job_formatter)
+    ################ End of setting of logger ################
+
+
+    ################ Main process ################
+    start: float = time.time()
+
+    logger.info(__file__ + f"\n\
+        \t\t\t\t--stage {stage}\n\
+        \t\t\t\t--input-dir {input_dir}\n\
+        \t\t\t\t--pattern {pattern}\n\
+        \t\t\t\t--manifest {manifest}\n\
+        \t\t\t\t--output-dir {output_dir}\n\
+        \t\t\t\t--jobs {jobs}\n\
+        \t\t\t\t--max-io {max_io}\n\
+        \t\t\t\t--metrics-file {metrics_file}\n\
+        \t\t\t\t{module_name} {' '.join(stage_args)}\n")
+    logger.info("=======================================================")
+    logger.info("Start program...")
+    logger.info(f"{len(file_jobs)} files will be processed by {n_workers} workers.")
+
+    queue = multiprocessing.Queue()
+    listener = QueueListener(queue, job_sh, job_fh)
+    listener.start()
+    results: List[Tuple[str, Dict[str, Any]]] = []
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 initializer=Init_worker,
+                                 initargs=(queue,)) as executor:
+            futures = [
+                executor.submit(
+                    Run_job, module_name,
+                    Job_settings(settings, i, o, n_workers))
+                for i, o in file_jobs]
+            for (input_path, _), future in zip(file_jobs, futures):
+                status, metrics = future.result()
+                results.append((status, metrics))
+                logger.info(f"{status}: {input_path}")
+    finally:
+        listener.stop()
+        job_fh.close()
+
+    # 各ファイルの結果を1つの表にまとめる
+    metric_names: List[str] = []
+    for _, metrics in results:
+        metric_names += [name for name in metrics if name not in metric_names]
+    with open(metrics_file, "w") as f:
+        f.write("\t".join(["input", "output", "status"] + metric_names) + "\n")
+        for (input_path, output_path), (status, metrics) \
+            in zip(file_jobs, results):
+            f.write("\t".join(
+                [input_path, output_path, status]
+                + [str(metrics.get(name, "NA")) for name in metric_names])
+                + "\n")
+
+    n_failed: int = sum(status != "OK" for status, _ in results)
+    end: float = time.time()
+    logger.info("Success processing!")
+    logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+    logger.info(f"{len(results) - n_failed} files were processed.")
+    if n_failed:
+        logger.info(f"Warning! {n_failed} files failed. Check the log above.")
+    logger.info(f"Metrics were written in {metrics_file} .")
+    logger.info("=======================================================")
+    # 失敗したファイルがあれば終了コード1で終わる
+    if n_failed:
+        sys.exit(1)
+    ################ End of main process ################
+
+
+if __name__=="__main__":
+    main()
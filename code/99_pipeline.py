@@ -0,0 +1,441 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+Python >= 3.7
+
+99_pipeline.py
+    -i (--input-file-path)
+    -od (--output-dir)
+    -bc (--beagle-command)
+    -a10 (--args-10)
+    -d (--diet)
+    -a12 (--args-12)
+    -t (--transpose)
+    -a15 (--args-15)
+    -a20 (--args-20)
+    -f (--force)
+
+00_before_imputation.py → Beagle → 10_after_imputation.py → 12_diet_data.py
+→ 20_PCA.pyを順に実行するスクリプト。
+(15_transpose_txt.shの転置は10または12の出力から別に作る)
+
+各ステージの出力の横に、入力(サイズ、更新時刻、先頭と末尾のハッシュ値)、
+引数、スクリプトのハッシュ値を記録する(<output>.stage.json)。
+記録と同じで出力も変わっていないステージは実行せずに飛ばすので、
+PCAの引数だけを変えた場合はPCAだけが実行される。
+入力には引数で指定したファイル(-a10の--group-file、-a20の--project)も含む。
+各ステージは呼び出したディレクトリで実行するので、引数には相対パスも使える。
+あるステージを実行すると、その下流のステージの記録は消して必ず実行し直す。
+--forceを指定すると全てのステージを実行し直す。
+
+--beagle-commandには{input}、{output}、{prefix}を含むコマンドを指定する。
+{output}には10_after_imputation.pyで読めるように圧縮しないVCFを書き出す。
+(例: "java -jar beagle.jar gt={input} out={prefix} && gunzip -c {prefix}.vcf.gz > {output}")
+指定しない場合はImputationを行わずに00の出力を10で処理する。
+各ステージの引数は-a10 "-cr [0:1:2] -mM 0.05"のように1つの文字列で渡す。
+(-a20="-im mean"のように=でつないでもよい)
+各ステージは終了コードで成否を判定し、0以外なら以降のステージは実行しない。
+'''
+
+import argparse
+import datetime
+import glob
+from logging import getLogger, StreamHandler, FileHandler, INFO, Formatter
+import os
+import shlex
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/src")
+from my_cache import Stage_fingerprint, Tool_version, Is_cached, \
+    Write_cache, Invalidate
+from my_utils import Runtime_counter
+
+
+CODE_DIR: str = os.path.dirname(os.path.abspath(__file__))
+# 20_PCA.pyはID列とサンプルの列だけを読むので、他の列は除く
+ARGS_10: str = "-cr [0:1:2] -mM 0.05 -mN 0.1 \
+-rf [CHROM:POS:REF:ALT:QUAL:FILTER:INFO:FORMAT]"
+# ステージの引数のうち、入力ファイルを指定するオプション
+# これらのファイルが変わった場合もステージを実行し直す
+ARG_INPUT_OPTIONS: Dict[str, List[str]] = {
+    "10": ["-gf", "--group-file"],
+    "20": ["-p", "--project"]}
+# ステージの引数を受け取るオプション
+STAGE_ARG_OPTIONS: List[str] = [
+    "-a10", "--args-10", "-a12", "--args-12",
+    "-a15", "--args-15", "-a20", "--args-20"]
+
+
+def Attach_stage_args(argv: List[str]) -> List[str]:
+    """
+    Join options of stage arguments and their values with "=".
+    Values such as "-im mean" start with "-", so argparse regards them
+    as options (-i) if they are given as separate arguments.
+
+    Arguments:
+    ----------
+    argv: List[str]
+        Command line arguments. (sys.argv[1:])
+
+    Returns:
+    ----------
+    argv: List[str]
+        Arguments where -a20 "-im mean" is changed to -a20=-im mean.
+    """
+    attached: List[str] = []
+    i: int = 0
+    while i < len(argv):
+        if argv[i] in STAGE_ARG_OPTIONS and i + 1 < len(argv):
+            attached.append(argv[i] + "=" + argv[i + 1])
+            i += 2
+        else:
+            attached.append(argv[i])
+            i += 1
+    return attached
+
+
+def Arg_inputs(name: str, args: List[str]) -> List[str]:
+    """
+    Find input files given in arguments of a stage.
+
+    Arguments:
+    ----------
+    name: str
+        Name of the stage.
+    args: List[str]
+        Arguments of the stage.
+
+    Returns:
+    ----------
+    paths: List[str]
+        Existing files given to options in ARG_INPUT_OPTIONS.
+        Missing files are left to the stage, which reports them.
+    """
+    options: List[str] = ARG_INPUT_OPTIONS.get(name, [])
+    paths: List[str] = []
+    for i, arg in enumerate(args):
+        option, _, value = arg.partition("=")
+        if option not in options:
+            continue
+        if not value and i + 1 < len(args):
+            value = args[i + 1]
+        if os.path.isfile(value):
+            paths.append(value)
+    return paths
+
+
+def Stage_tool(names: List[str]) -> str:
+    """
+    Get version of a stage from its scripts and modules in src.
+
+    Arguments:
+    ----------
+    names: List[str]
+        File names of scripts of the stage.
+
+    Returns:
+    ----------
+    version: str
+        Version got from Tool_version function.
+    """
+    modules: List[str] = \
+        sorted(glob.glob(os.path.join(CODE_DIR, "src", "my_*.py")))
+    return Tool_version(
+        [os.path.join(CODE_DIR, name) for name in names] + modules)
+
+
+def Make_stages(input_file_path: str, output_dir: str, beagle_command: str,
+                stage_args: Dict[str, List[str]], diet: bool,
+                transpose: bool) -> List[Dict[str, Any]]:
+    """
+    Make stages of the pipeline in order of execution.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to input VCF.
+    output_dir: str
+        Directory of outputs of all stages.
+    beagle_command: str
+        Command of Beagle. If empty, Beagle is skipped.
+    stage_args: Dict[str, List[str]]
+        Arguments of each stage. ("10", "12", "15", "20")
+    diet: bool
+        If True, 12_diet_data.py is run before PCA.
+    transpose: bool
+        If True, 15_transpose_txt.sh is run.
+
+    Returns:
+    ----------
+    stages: List[Dict[str, Any]]
+        {"name", "command", "inputs", "outputs", "args", "tool", "upstream"}
+        of each stage. upstream is name of the stage which makes the input.
+    """
+    stages: List[Dict[str, Any]] = []
+    vcf: str = os.path.join(output_dir, "00_before_imputation.vcf")
+    stages.append({
+        "name": "00", "inputs": [input_file_path], "outputs": [vcf], "args": [],
+        "command": [sys.executable,
+                    os.path.join(CODE_DIR, "00_before_imputation.py"),
+                    "-i", input_file_path, "-o", vcf],
+        "tool": Stage_tool(["00_before_imputation.py"]),
+        "upstream": None})
+    upstream: str = "00"
+
+    if beagle_command:
+        imputed: str = os.path.join(output_dir, "beagle.vcf")
+        stages.append({
+            "name": "beagle", "inputs": [vcf], "outputs": [imputed],
+            "args": [beagle_command],
+            "command": beagle_command.format(
+                input=shlex.quote(vcf), output=shlex.quote(imputed),
+                prefix=shlex.quote(os.path.join(output_dir, "beagle"))),
+            "tool": "", "upstream": upstream})
+        vcf, upstream = imputed, "beagle"
+
+    numeric: str = os.path.join(output_dir, "10_after_imputation.txt")
+    stages.append({
+        "name": "10", "inputs": [vcf] + Arg_inputs("10", stage_args["10"]),
+        "outputs": [numeric],
+        "args": stage_args["10"],
+        "command": [sys.executable,
+                    os.path.join(CODE_DIR, "10_after_imputation.py"),
+                    "-i", vcf, "-o", numeric] + stage_args["10"],
+        "tool": Stage_tool(["10_after_imputation.py"]),
+        "upstream": upstream})
+    upstream = "10"
+
+    if diet:
+        dieted: str = os.path.join(output_dir, "12_diet_data.txt")
+        stages.append({
+            "name": "12", "inputs": [numeric], "outputs": [dieted],
+            "args": stage_args["12"],
+            "command": [sys.executable,
+                        os.path.join(CODE_DIR, "12_diet_data.py"),
+                        "-i", numeric, "-o", dieted] + stage_args["12"],
+            "tool": Stage_tool(["12_diet_data.py"]),
+            "upstream": upstream})
+        numeric, upstream = dieted, "12"
+
+    if transpose:
+        transposed: str = os.path.join(output_dir, "15_transposed.txt")
+        stages.append({
+            "name": "15", "inputs": [numeric], "outputs": [transposed],
+            "args": stage_args["15"],
+            "command": ["bash", os.path.join(CODE_DIR, "15_transpose_txt.sh"),
+                        numeric, transposed] + stage_args["15"],
+            "tool": Stage_tool(
+                ["15_transpose_txt.sh", "15_transpose_txt.py"]),
+            "upstream": upstream})
+
+    pca: str = os.path.join(output_dir, "20_PCA")
+    stages.append({
+        "name": "20", "inputs": [numeric] + Arg_inputs("20", stage_args["20"]),
+        "outputs": [pca],
+        "args": stage_args["20"],
+        "command": [sys.executable,
+                    os.path.join(CODE_DIR, "20_PCA.py"),
+                    "-i", numeric, "-od", pca] + stage_args["20"],
+        "tool": Stage_tool(["20_PCA.py"]),
+        "upstream": upstream})
+    return stages
+
+
+def Downstream(stages: List[Dict[str, Any]], name: str
+               ) -> List[Dict[str, Any]]:
+    """
+    Find all stages which use outputs of the stage directly or indirectly.
+
+    Arguments:
+    ----------
+    stages: List[Dict[str, Any]]
+        Stages got from Make_stages function.
+    name: str
+        Name of the stage.
+
+    Returns:
+    ----------
+    downstream: List[Dict[str, Any]]
+        Stages downstream of the stage.
+    """
+    names: set = {name}
+    downstream: List[Dict[str, Any]] = []
+    for stage in stages:
+        if stage["upstream"] in names:
+            names.add(stage["name"])
+            downstream.append(stage)
+    return downstream
+
+
+def main():
+    ################ Setting command line arguments ################
+    parser=argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    # 入力ファイルのパス(必須)
+    parser.add_argument(
+        "-i", "--input-file-path", type=str, action="store",
+        dest="inputFilePath", required=True, help="Path to input VCF.")
+
+    # ファイルの出力先(必須)
+    parser.add_argument(
+        "-od", "--output-dir", type=str, action="store",
+        dest="output_dir", required=True,
+        help="Directory to output files of all stages.")
+
+    # Beagleのコマンド
+    # (デフォルトはFalse、Imputationを行わない)
+    parser.add_argument(
+        "-bc", "--beagle-command", type=str, action="store",
+        dest="beagle_command", default=False,
+        help="Command of Beagle with {input}, {output} and {prefix}. \
+        {output} must be uncompressed VCF. default=False")
+
+    # 10_after_imputation.pyの引数
+    parser.add_argument(
+        "-a10", "--args-10", type=str, action="store",
+        dest="args_10", default=ARGS_10,
+        help=f"Arguments of 10_after_imputation.py except -i, -o. \
+        (default='{ARGS_10}')")
+
+    # 12_diet_data.pyで削減するか否か
+    parser.add_argument(
+        "-d", "--diet", action="store_true", dest="diet",
+        help="If specified, 12_diet_data.py is run before PCA.")
+
+    # 12_diet_data.pyの引数
+    parser.add_argument(
+        "-a12", "--args-12", type=str, action="store",
+        dest="args_12", default="",
+        help="Arguments of 12_diet_data.py except -i, -o.")
+
+    # 15_transpose_txt.shで転置するか否か
+    parser.add_argument(
+        "-t", "--transpose", action="store_true", dest="transpose",
+        help="If specified, 15_transpose_txt.sh is run.")
+
+    # 15_transpose_txt.shの3つ目の引数
+    parser.add_argument(
+        "-a15", "--args-15", type=str, action="store",
+        dest="args_15", default="",
+        help="Chunk size or max memory of 15_transpose_txt.sh.")
+
+    # 20_PCA.pyの引数
+    parser.add_argument(
+        "-a20", "--args-20", type=str, action="store",
+        dest="args_20", default="",
+        help="Arguments of 20_PCA.py except -i, -od.")
+
+    # キャッシュを使わずに全て実行し直すか否か
+    parser.add_argument(
+        "-f", "--force", action="store_true", dest="force",
+        help="If specified, all stages are run again.")
+
+    args = parser.parse_args(Attach_stage_args(sys.argv[1:]))
+    input_file_path: str = os.path.abspath(args.inputFilePath)
+    output_dir: str = os.path.abspath(args.output_dir)
+    beagle_command: str = args.beagle_command
+    diet: bool = args.diet
+    transpose: bool = args.transpose
+    force: bool = args.force
+    stage_args: Dict[str, List[str]] = {
+        "10": shlex.split(args.args_10),
+        "12": shlex.split(args.args_12),
+        "15": shlex.split(args.args_15),
+        "20": shlex.split(args.args_20)}
+
+    if beagle_command and "{output}" not in beagle_command:
+        print("--beagle-command must contain {output}.")
+        sys.exit(1)
+    if not os.path.isfile(input_file_path):
+        print(f"File: {input_file_path} does not exisit.")
+        sys.exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+    ################ End of setting command line arguments ################
+
+
+    ################ Setting of logger ################
+    logger = getLogger(__name__)
+    logger.setLevel(INFO)
+    sh = StreamHandler()
+    sh.setLevel(INFO)
+    sh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    fh = FileHandler(
+        filename=__file__ + datetime.datetime.now().isoformat() +".log")
+    fh.setLevel(INFO)
+    fh.setFormatter(Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(sh)
+    logger.addHandler(fh)
+    ################ End of setting of logger ################
+
+
+    ################ Main process ################
+    start: float = time.time()
+
+    logger.info(__file__ + f"\n\
+        \t\t\t\t--input_file_path {input_file_path}\n\
+        \t\t\t\t--output-dir {output_dir}\n\
+        \t\t\t\t--beagle-command {beagle_command}\n\
+        \t\t\t\t--args-10 {stage_args['10']}\n\
+        \t\t\t\t--diet {diet}\n\
+        \t\t\t\t--args-12 {stage_args['12']}\n\
+        \t\t\t\t--transpose {transpose}\n\
+        \t\t\t\t--args-15 {stage_args['15']}\n\
+        \t\t\t\t--args-20 {stage_args['20']}\n\
+        \t\t\t\t--force {force}\n")
+    logger.info("=======================================================")
+    logger.info("Start program...")
+
+    stages: List[Dict[str, Any]] = Make_stages(
+        input_file_path, output_dir, beagle_command, stage_args, diet, transpose)
+    run_stages: List[str] = []
+    skipped_stages: List[str] = []
+    for stage in stages:
+        fingerprint: Dict[str, Any] = Stage_fingerprint(
+            stage["name"], stage["inputs"], stage["args"], stage["tool"])
+        # 上流が実行されていれば、記録が消えているので必ず実行される
+        if not force and Is_cached(stage["outputs"], fingerprint):
+            logger.info(f"Stage {stage['name']}: up to date, skipped.")
+            skipped_stages.append(stage["name"])
+            continue
+
+        # 下流の出力は古くなるので、途中で止まっても使われないように記録を消す
+        Invalidate(stage["outputs"][0])
+        for downstream in Downstream(stages, stage["name"]):
+            if Invalidate(downstream["outputs"][0]):
+                logger.info(f"Stage {downstream['name']}: invalidated.")
+
+        logger.info(f"Stage {stage['name']}: running...")
+        stage_start: float = time.time()
+        # 引数の相対パスが使えるように、呼び出したディレクトリで実行する
+        result = subprocess.run(
+            stage["command"], shell=isinstance(stage["command"], str))
+        # 各スクリプトはエラーの時に終了コード1で終わる
+        if result.returncode != 0:
+            logger.info("Error!")
+            logger.info(f"Stage {stage['name']} failed. "
+                        f"(exit status {result.returncode})")
+            logger.info("Suspend the process.")
+            logger.info("=======================================================")
+            sys.exit(1)
+        Write_cache(stage["outputs"], fingerprint)
+        run_stages.append(stage["name"])
+        stage_end: float = time.time()
+        logger.info(f"Stage {stage['name']}: done in "
+                    f"{Runtime_counter(stage_start, stage_end)} seconds.")
+
+    end: float = time.time()
+    logger.info("Success processing!")
+    logger.info(f"Run Time = {Runtime_counter(start, end)} seconds")
+    logger.info(f"Run: {run_stages}, Skipped: {skipped_stages}")
+    logger.info(f"Outputs were written in {output_dir} .")
+    logger.info("=======================================================")
+    ################ End of main process ################
+
+
+if __name__=="__main__":
+    main()
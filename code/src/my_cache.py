@@ -0,0 +1,229 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールは各ステージの出力が入力、引数、スクリプトから見て
+最新かどうかを判定するキャッシュに関する関数をまとめたものです。
+
+ステージを実行したら、出力の横(<output>.stage.json)に以下を記録する。
+    stage        ステージの名前
+    key          下の3つをまとめたハッシュ値
+    inputs       入力ファイルのサイズ、更新時刻、先頭と末尾のハッシュ値
+    args         引数
+    tool         スクリプト(とsrcのモジュール)のハッシュ値
+    outputs      出力ファイルのサイズ、更新時刻、先頭と末尾のハッシュ値
+同じkeyで、出力も記録した時から変わっていなければ再実行は要らない。
+ファイル全体は読まないので、大きなファイルでもすぐに判定できる。
+'''
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+
+CACHE_SUFFIX: str = ".stage.json"
+# ハッシュ値を計算する先頭、末尾のバイト数
+PARTIAL_HASH_SIZE: int = 1 << 20
+
+
+def Sidecar_path(output_path: str) -> str:
+    """
+    This function returns path to the cache record of an output.
+
+    Arguments:
+    ----------
+    output_path: str
+        Path to output file or directory.
+
+    Returns:
+    ----------
+    sidecar_path: str
+        <output_path>.stage.json
+    """
+    return output_path.rstrip("/") + CACHE_SUFFIX
+
+
+def File_fingerprint(path: str) -> Dict[str, Any]:
+    """
+    This function makes fingerprint of a file from size, mtime,
+    and hash of the head and the tail.
+    For a directory, fingerprints of files in it are used.
+
+    Arguments:
+    ----------
+    path: str
+        Path to file or directory.
+
+    Returns:
+    ----------
+    fingerprint: Dict[str, Any]
+        {"path", "size", "mtime", "hash"}
+    """
+    if os.path.isdir(path):
+        files: List[str] = sorted(
+            f for f in glob.glob(os.path.join(path, "*")) if os.path.isfile(f))
+        digest = hashlib.sha256()
+        for f in files:
+            digest.update(json.dumps(File_fingerprint(f)).encode())
+        return {"path": path, "size": len(files), "mtime": None,
+                "hash": digest.hexdigest()}
+
+    stat: os.stat_result = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_HASH_SIZE))
+        # 末尾(先頭と重ならない部分)
+        if stat.st_size > PARTIAL_HASH_SIZE:
+            f.seek(max(PARTIAL_HASH_SIZE, stat.st_size - PARTIAL_HASH_SIZE))
+            digest.update(f.read())
+    return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime_ns,
+            "hash": digest.hexdigest()}
+
+
+def Tool_version(paths: List[str]) -> str:
+    """
+    This function returns hash of scripts as version of the tool.
+
+    Arguments:
+    ----------
+    paths: List[str]
+        Paths to the script and modules it uses.
+
+    Returns:
+    ----------
+    version: str
+        Hash of all the files.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def Stage_fingerprint(stage: str, inputs: List[str], args: List[str],
+                      tool: str) -> Dict[str, Any]:
+    """
+    This function makes fingerprint of a stage.
+
+    Arguments:
+    ----------
+    stage: str
+        Name of the stage.
+    inputs: List[str]
+        Paths to input files.
+    args: List[str]
+        Arguments of the stage. (except paths of inputs and outputs)
+    tool: str
+        Version got from Tool_version function.
+
+    Returns:
+    ----------
+    fingerprint: Dict[str, Any]
+        {"stage", "key", "inputs", "args", "tool"}
+    """
+    fingerprint: Dict[str, Any] = {
+        "stage": stage,
+        "inputs": [File_fingerprint(path) for path in inputs],
+        "args": list(args),
+        "tool": tool}
+    fingerprint["key"] = hashlib.sha256(json.dumps(
+        [fingerprint["inputs"], fingerprint["args"], tool],
+        sort_keys=True).encode()).hexdigest()
+    return fingerprint
+
+
+def Load_cache(output_path: str) -> Optional[Dict[str, Any]]:
+    """
+    This function loads cache record of an output.
+
+    Arguments:
+    ----------
+    output_path: str
+        Path to output file or directory.
+
+    Returns:
+    ----------
+    record: Dict[str, Any]
+        Record written by Write_cache function. None if there is not.
+    """
+    try:
+        with open(Sidecar_path(output_path), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def Is_cached(output_paths: List[str], fingerprint: Dict[str, Any]) -> bool:
+    """
+    This function checks whether outputs of a stage are still valid.
+
+    Arguments:
+    ----------
+    output_paths: List[str]
+        Paths to outputs. The record is next to the first one.
+    fingerprint: Dict[str, Any]
+        Fingerprint got from Stage_fingerprint function.
+
+    Returns:
+    ----------
+    return: bool
+        True if the stage was run with the same inputs, arguments and tool,
+        and the outputs have not been changed since then.
+    """
+    record: Optional[Dict[str, Any]] = Load_cache(output_paths[0])
+    if record is None or record.get("key") != fingerprint["key"]:
+        return False
+    if not all(os.path.exists(path) for path in output_paths):
+        return False
+    return record.get("outputs") == \
+        [File_fingerprint(path) for path in output_paths]
+
+
+def Write_cache(output_paths: List[str], fingerprint: Dict[str, Any]) -> None:
+    """
+    This function records fingerprint of a stage after it was run.
+
+    Arguments:
+    ----------
+    output_paths: List[str]
+        Paths to outputs. The record is written next to the first one.
+    fingerprint: Dict[str, Any]
+        Fingerprint got from Stage_fingerprint function.
+    """
+    record: Dict[str, Any] = dict(fingerprint)
+    record["outputs"] = [File_fingerprint(path) for path in output_paths]
+    record["created"] = datetime.datetime.now().isoformat()
+    with open(Sidecar_path(output_paths[0]), "w") as f:
+        json.dump(record, f, indent=1)
+
+
+def Invalidate(output_path: str) -> bool:
+    """
+    This function removes cache record of an output,
+    so that the stage is run again next time.
+
+    Arguments:
+    ----------
+    output_path: str
+        Path to output file or directory.
+
+    Returns:
+    ----------
+    return: bool
+        True if a record was removed.
+    """
+    try:
+        os.remove(Sidecar_path(output_path))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def main():
+    print("Hello, this is my_cache.py")
+
+if __name__=="__main__":
+    main()
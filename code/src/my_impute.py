@@ -0,0 +1,73 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールは数値化したジェノタイプの欠損値(NA)を
+SNPごとに補完する関数をまとめたものです。
+'''
+
+from typing import Tuple
+
+import numpy as np
+
+
+IMPUTE_METHODS: Tuple[str, ...] = ("mean", "mode")
+
+
+def Impute_rows(matrix: np.ndarray, method: str
+                ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    This function fills NA(nan) of each row(SNP) with mean or mode of the row.
+
+    Arguments:
+    ----------
+    matrix: np.ndarray
+        Numeric genotypes. (SNP x sample) 1-D array is regarded as one SNP.
+    method: str
+        "mean" or "mode".
+
+    Returns:
+    ----------
+    filled: np.ndarray
+        Matrix whose NA were filled. Same shape as matrix.
+        Rows with no genotyped sample remain NA.
+    filled_mask: np.ndarray
+        Boolean matrix, True where the value was filled.
+    """
+    if method not in IMPUTE_METHODS:
+        raise ValueError(f"method must be one of {IMPUTE_METHODS}")
+    masked: np.ma.MaskedArray = np.ma.masked_invalid(np.atleast_2d(matrix))
+    if method == "mean":
+        fill: np.ma.MaskedArray = masked.mean(axis=1)
+    else:
+        # 行ごとに並べ替え、同じ値が続く長さが最大の値を最頻値とする。
+        # 値の種類によらず並べ替え1回で済む。(同数の場合は小さい方の値)
+        data: np.ndarray = np.sort(masked.filled(np.nan), axis=1) # NAは末尾
+        starts: np.ndarray = np.ones(data.shape, dtype=bool)
+        starts[:, 1:] = data[:, 1:] != data[:, :-1]
+        starts &= ~np.isnan(data)
+        rows, cols = np.nonzero(starts)
+        # 次の値の始まりまで(行の最後の値はNAでない値の数まで)が続く長さ
+        last: np.ndarray = np.ones(len(rows), dtype=bool)
+        last[:-1] = rows[1:] != rows[:-1]
+        ends: np.ndarray = np.empty_like(cols)
+        ends[:-1] = cols[1:]
+        ends[last] = masked.count(axis=1)[rows[last]]
+        order: np.ndarray = np.lexsort((cols, cols - ends, rows))
+        mode_rows, first = np.unique(rows[order], return_index=True)
+        fill = np.ma.masked_all(masked.shape[0])
+        fill[mode_rows] = data[mode_rows, cols[order][first]]
+    # 全てNAの行は補完できないのでNAのまま残す。
+    filled_mask: np.ndarray = \
+        np.ma.getmaskarray(masked) & ~np.ma.getmaskarray(fill)[:, None]
+    filled: np.ndarray = np.where(
+        filled_mask, fill.filled(np.nan)[:, None], masked.filled(np.nan))
+    filled = filled.astype(np.asarray(matrix).dtype, copy=False)
+    return filled.reshape(np.shape(matrix)), \
+        filled_mask.reshape(np.shape(matrix))
+
+
+def main():
+    print("Hello, this is my_impute.py")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,375 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールは位置のインデックスを作り、
+指定した領域(region)の行だけを読み出す関数をまとめたものです。
+
+テキストファイルの場合は<path>.vidxにインデックスを書き出す。
+    #size        インデックスを作った時のファイルのサイズ
+    #mtime       インデックスを作った時のファイルの更新時刻(ns)
+    #bin_size    16384
+    #data_start  ヘッダーの後ろ(最初のData line)のバイト位置
+    #chrom_col   染色体の列番号
+    #pos_col     物理位置の列番号
+    contig  bin  offset   (binごとの最初の行のバイト位置)
+BGZFで圧縮したVCF(.gz)の場合はtabixのインデックス(.tbi)を作る。(pysamが必要)
+
+インデックスの作成、読み出しともに入力は染色体、物理位置の順に並んでいる必要がある。
+ファイルのサイズか更新時刻がインデックスと違う場合は、古いインデックスとして使わない。
+'''
+
+from bisect import bisect_left
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+
+
+INDEX_SUFFIX: str = ".vidx"
+BIN_SIZE: int = 16384
+REGION: Pattern = re.compile(r"^([^:]+)(?::([\d,]+)?-?([\d,]+)?)?$")
+
+
+def Is_bgzf(path: str) -> bool:
+    """
+    This function checks whether the file is BGZF(bgzip) compressed.
+
+    Arguments:
+    ----------
+    path: str
+        Path to file.
+
+    Returns:
+    ----------
+    return: bool
+        If the file is compressed by bgzip, return True.
+    """
+    with open(path, "rb") as f:
+        magic: bytes = f.read(16)
+    # gzipのマジックナンバーとBGZFの拡張フィールド("BC")
+    return magic[:4] == b"\x1f\x8b\x08\x04" and magic[12:14] == b"BC"
+
+
+def Parse_region(region: str) -> Tuple[str, int, float]:
+    """
+    This function parses region string.
+
+    Arguments:
+    ----------
+    region: str
+        "contig", "contig:start-end", "contig:start-" or "contig:-end".
+        Positions are 1-based and inclusive.
+
+    Returns:
+    ----------
+    contig: str
+        Contig name as written in the file.
+    start: int
+        Start position.
+    end: float
+        End position. (inf if not specified)
+    """
+    matched = REGION.match(region)
+    if not matched:
+        raise ValueError(f"Invalid region: {region}")
+    contig, start, end = matched.groups()
+    start_pos: int = int(start.replace(",", "")) if start else 1
+    end_pos: float = int(end.replace(",", "")) if end else float("inf")
+    # "contig:100"のように位置が1つだけの場合はその位置だけ
+    if start and end is None and not region.endswith("-"):
+        end_pos = start_pos
+    return contig, start_pos, end_pos
+
+
+def Find_columns(header: str) -> Tuple[int, int]:
+    """
+    This function finds CHROM and POS columns from header line.
+
+    Arguments:
+    ----------
+    header: str
+        Header line. (#CHROM of VCF or CHROM of 10_after_imputation.py)
+
+    Returns:
+    ----------
+    chrom_col, pos_col: int
+        Index of CHROM and POS columns.
+    """
+    columns: List[str] = header.rstrip("\r\n").split("\t")
+    columns = [c.lstrip("#") for c in columns]
+    try:
+        return columns.index("CHROM"), columns.index("POS")
+    except ValueError:
+        raise ValueError("CHROM and POS columns are needed to build index.")
+
+
+def Build_index(path: str, bin_size: int = BIN_SIZE) -> Dict[str, Any]:
+    """
+    This function builds position index of a plain text file,
+    and writes it to <path>.vidx.
+
+    Arguments:
+    ----------
+    path: str
+        Path to VCF or output of 10_after_imputation.py.
+    bin_size: int
+        Size of position bin. default=16384
+
+    Returns:
+    ----------
+    index: Dict[str, Any]
+        Index loaded by Load_index function.
+    """
+    bins: List[Tuple[str, int, int]] = []
+    chrom_col: int = 0
+    pos_col: int = 1
+    data_start: Optional[int] = None
+    seen: set = set()
+    last: Tuple[str, int] = ("", 0)
+    offset: int = 0
+    with open(path, "rb") as input_file:
+        for raw_line in input_file:
+            line_offset: int = offset
+            offset += len(raw_line)
+            line: str = raw_line.decode()
+            if data_start is None:
+                # ヘッダー(##, #CHROM, CHROM)の後ろからData lineが始まる
+                if line.startswith("##"):
+                    continue
+                if line.startswith("#CHROM") or line.startswith("CHROM"):
+                    chrom_col, pos_col = Find_columns(line)
+                    continue
+                data_start = line_offset
+            fields: List[str] = line.split("\t", max(chrom_col, pos_col) + 1)
+            contig: str = fields[chrom_col]
+            pos: int = int(fields[pos_col])
+            if contig != last[0]:
+                if contig in seen:
+                    raise ValueError(f"{path} is not sorted. ({contig})")
+                seen.add(contig)
+            elif pos < last[1]:
+                raise ValueError(f"{path} is not sorted. ({contig}:{pos})")
+            last = (contig, pos)
+            # binごとに最初の行の位置だけ記録する
+            bin_number: int = pos // bin_size
+            if not bins or bins[-1][0] != contig or bins[-1][1] != bin_number:
+                bins.append((contig, bin_number, line_offset))
+    if data_start is None:
+        data_start = offset
+
+    stat: os.stat_result = os.stat(path)
+    with open(path + INDEX_SUFFIX, "w") as index_file:
+        index_file.write(f"#size\t{stat.st_size}\n")
+        index_file.write(f"#mtime\t{stat.st_mtime_ns}\n")
+        index_file.write(f"#bin_size\t{bin_size}\n")
+        index_file.write(f"#data_start\t{data_start}\n")
+        index_file.write(f"#chrom_col\t{chrom_col}\n")
+        index_file.write(f"#pos_col\t{pos_col}\n")
+        for contig, bin_number, line_offset in bins:
+            index_file.write(f"{contig}\t{bin_number}\t{line_offset}\n")
+    return Load_index(path)
+
+
+def Load_index(path: str) -> Dict[str, Any]:
+    """
+    This function loads <path>.vidx written by Build_index function.
+
+    Arguments:
+    ----------
+    path: str
+        Path to indexed file. (not the index itself)
+
+    Returns:
+    ----------
+    index: Dict[str, Any]
+        {"size": int, "mtime": int, "bin_size": int, "data_start": int,
+         "chrom_col": int, "pos_col": int,
+         "bins": {contig: ([bin, ...], [offset, ...])}}
+
+    Raises:
+    ----------
+    ValueError
+        If the file was changed after the index was built.
+    """
+    index: Dict[str, Any] = {"bins": {}}
+    with open(path + INDEX_SUFFIX, "r") as index_file:
+        for line in index_file:
+            fields: List[str] = line.rstrip("\n").split("\t")
+            if line.startswith("#"):
+                index[fields[0][1:]] = int(fields[1])
+            else:
+                bin_list, offsets = index["bins"].setdefault(fields[0], ([], []))
+                bin_list.append(int(fields[1]))
+                offsets.append(int(fields[2]))
+    # 古いインデックスで読むと行の途中から読んでしまう
+    stat: os.stat_result = os.stat(path)
+    if index.get("size") != stat.st_size \
+        or index.get("mtime") != stat.st_mtime_ns:
+        raise ValueError(f"{path}{INDEX_SUFFIX} does not match {path}. "
+                         "Build the index again by 05_index.py.")
+    return index
+
+
+def Region_offset(index: Dict[str, Any], contig: str,
+                  start: int) -> Optional[int]:
+    """
+    This function returns the byte offset to start reading a region.
+
+    Arguments:
+    ----------
+    index: Dict[str, Any]
+        Index loaded by Load_index function.
+    contig: str
+        Contig name.
+    start: int
+        Start position of the region.
+
+    Returns:
+    ----------
+    offset: int
+        Byte offset of the first line which may be in the region.
+        If no line can be in the region, return None.
+    """
+    if contig not in index["bins"]:
+        return None
+    bin_list, offsets = index["bins"][contig]
+    # 入力は並んでいるので、start以降の最初のbinから読めば良い
+    i: int = bisect_left(bin_list, start // index["bin_size"])
+    if i == len(bin_list):
+        return None
+    return offsets[i]
+
+
+def Missing_contigs(path: str, regions: List[str]) -> List[str]:
+    """
+    This function finds contigs of regions which are not in the index.
+    Iter_region_lines function skips such regions.
+
+    Arguments:
+    ----------
+    path: str
+        Path to indexed file.
+    regions: List[str]
+        Regions parsed by Parse_region function.
+
+    Returns:
+    ----------
+    missing: List[str]
+        Contig names not in the index, in order of regions.
+    """
+    if Is_bgzf(path):
+        import pysam # 圧縮したVCFを扱う場合だけ必要
+        with pysam.TabixFile(path) as tabix_file:
+            contigs: set = set(tabix_file.contigs)
+    else:
+        contigs = set(Load_index(path)["bins"])
+    missing: List[str] = []
+    for region in regions:
+        contig: str = Parse_region(region)[0]
+        if contig not in contigs and contig not in missing:
+            missing.append(contig)
+    return missing
+
+
+def Iter_region_lines(path: str, regions: List[str]) -> Iterator[str]:
+    """
+    This function yields header lines and Data lines in regions,
+    seeking directly to each region by index.
+    Cost is proportional to the size of regions, not the file.
+
+    Arguments:
+    ----------
+    path: str
+        Path to indexed file. Plain text needs <path>.vidx,
+        BGZF compressed VCF needs <path>.tbi (and pysam).
+    regions: List[str]
+        Regions parsed by Parse_region function. (e.g. ["Chr07:100-2000"])
+
+    Yields:
+    ----------
+    line: str
+        Header lines first, and then Data lines in the regions.
+        Lines end with "\\n".
+    """
+    if Is_bgzf(path):
+        yield from Iter_tabix_lines(path, regions)
+        return
+
+    index: Dict[str, Any] = Load_index(path)
+    chrom_col: int = index["chrom_col"]
+    pos_col: int = index["pos_col"]
+    with open(path, "rb") as input_file:
+        # ヘッダー部分はそのまま返す
+        header: str = input_file.read(index["data_start"]).decode()
+        yield from header.splitlines(keepends=True)
+        for region in regions:
+            contig, start, end = Parse_region(region)
+            offset: Optional[int] = Region_offset(index, contig, start)
+            if offset is None:
+                continue
+            input_file.seek(offset)
+            for raw_line in input_file:
+                fields: List[bytes] = \
+                    raw_line.split(b"\t", max(chrom_col, pos_col) + 1)
+                pos: int = int(fields[pos_col])
+                if fields[chrom_col].decode() != contig or pos > end:
+                    break
+                if pos >= start:
+                    yield raw_line.decode()
+
+
+def Build_tabix(path: str) -> str:
+    """
+    This function builds tabix index(.tbi) of BGZF compressed VCF.
+    pysam is required.
+
+    Arguments:
+    ----------
+    path: str
+        Path to BGZF compressed VCF. (.vcf.gz)
+
+    Returns:
+    ----------
+    index_path: str
+        Path to the tabix index.
+    """
+    import pysam # 圧縮したVCFを扱う場合だけ必要
+    pysam.tabix_index(path, preset="vcf", force=True)
+    return path + ".tbi"
+
+
+def Iter_tabix_lines(path: str, regions: List[str]) -> Iterator[str]:
+    """
+    This function yields header lines and Data lines in regions
+    of BGZF compressed VCF by tabix index. pysam is required.
+
+    Arguments:
+    ----------
+    path: str
+        Path to BGZF compressed VCF with tabix index(.tbi).
+    regions: List[str]
+        Regions parsed by Parse_region function.
+
+    Yields:
+    ----------
+    line: str
+        Header lines first, and then Data lines in the regions.
+    """
+    import pysam # 圧縮したVCFを扱う場合だけ必要
+    with pysam.TabixFile(path) as tabix_file:
+        for line in tabix_file.header:
+            yield line + "\n"
+        for region in regions:
+            contig, start, end = Parse_region(region)
+            if contig not in tabix_file.contigs:
+                continue
+            # pysamは0-based、半開区間
+            stop: Optional[int] = None if end == float("inf") else int(end)
+            for line in tabix_file.fetch(contig, start - 1, stop):
+                yield line + "\n"
+
+
+def main():
+    print("Hello, this is my_index.py")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,219 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールはメモリの上限(--max-memory)から
+一度に読み込む行数(チャンクサイズ)を決める関数をまとめたものです。
+'''
+
+import argparse
+import io
+import os
+from typing import Optional
+
+
+UNITS: dict = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# 利用可能なメモリのうち、"auto"で使う割合
+AUTO_FRACTION: float = 0.8
+
+# PCAで1行(SNP)あたりに作られるコピーの数の見積もり
+# 読み込み、標準化、転置、PCA内部のコピーで4倍程度になる。
+PCA_OVERHEAD: float = 4.0
+
+# 書き出しのバッファの上限
+# これより大きくしても書き出しは速くならない。
+IO_BUFFER_MAX: int = 4 * 1024**2
+
+# Parquetのrow groupで1行(SNP)あたりに作られるコピーの数の見積もり
+# float32のバッファ、型変換、転置、Arrowの配列で4倍程度になる。
+PARQUET_OVERHEAD: float = 4.0
+
+
+def Available_memory() -> int:
+    """
+    This function returns available memory of this machine.
+
+    Returns:
+    ----------
+    available: int
+        Available memory (bytes).
+        MemAvailable of /proc/meminfo if exists, otherwise physical memory.
+    """
+    try:
+        with open("/proc/meminfo", "r") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    # /proc/meminfoが無い環境(Macなど)では物理メモリを使う。
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def Parse_memory(memory: Optional[str]) -> Optional[int]:
+    """
+    This function converts --max-memory argument to bytes.
+
+    Arguments:
+    ----------
+    memory: str
+        e.g. "512M", "8G", "1073741824" or "auto".
+        "auto" means 80% of available memory.
+        None means no limit.
+
+    Returns:
+    ----------
+    max_memory: int
+        Memory budget (bytes). If memory is None, return None.
+    """
+    if memory is None:
+        return None
+    memory = memory.strip().upper()
+    if memory == "AUTO":
+        return int(Available_memory() * AUTO_FRACTION)
+    if memory.endswith("B"):
+        memory = memory[:-1]
+    unit: int = UNITS.get(memory[-1:], 1)
+    number: str = memory[:-1] if memory[-1:] in UNITS else memory
+    try:
+        max_memory: int = int(float(number) * unit)
+    except ValueError:
+        raise ValueError(f"Invalid memory size: {memory}")
+    if max_memory <= 0:
+        raise ValueError(f"Invalid memory size: {memory}")
+    return max_memory
+
+
+def Memory_type(memory: str) -> int:
+    """
+    This function is given to type of --max-memory argument,
+    so that invalid sizes are reported by argparse.
+
+    Arguments:
+    ----------
+    memory: str
+        e.g. "512M", "8G", "1073741824" or "auto".
+
+    Returns:
+    ----------
+    max_memory: int
+        Memory budget (bytes) got from Parse_memory function.
+    """
+    try:
+        return Parse_memory(memory)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"{e} (e.g. 512M, 8G, auto)")
+
+
+def Bytes_per_row(n_columns: int, itemsize: int = 8,
+                  overhead: float = 1.0) -> int:
+    """
+    This function estimates bytes per row(SNP) on memory.
+
+    Arguments:
+    ----------
+    n_columns: int
+        Number of columns. (samples)
+    itemsize: int
+        Bytes of one value. (float64: 8, float32: 4)
+    overhead: float
+        Number of copies made while processing.
+        (e.g. standardization and transposition make copies)
+
+    Returns:
+    ----------
+    bytes_per_row: int
+        Estimated bytes per row.
+    """
+    return max(1, int(n_columns * itemsize * overhead))
+
+
+def Rows_per_block(max_memory: int, n_columns: int, itemsize: int = 8,
+                   overhead: float = 1.0) -> int:
+    """
+    This function returns number of rows which fit in max_memory.
+
+    Arguments:
+    ----------
+    max_memory: int
+        Memory budget (bytes) got from Parse_memory function.
+    n_columns: int
+        Number of columns. (samples)
+    itemsize: int
+        Bytes of one value.
+    overhead: float
+        Number of copies made while processing.
+
+    Returns:
+    ----------
+    rows: int
+        Number of rows to read at one time. At least 1.
+    """
+    return max(1, max_memory // Bytes_per_row(n_columns, itemsize, overhead))
+
+
+def Io_buffer_size(max_memory: Optional[int]) -> int:
+    """
+    This function decides size of a write buffer from memory budget.
+
+    Arguments:
+    ----------
+    max_memory: int
+        Memory budget (bytes) got from Parse_memory function.
+
+    Returns:
+    ----------
+    buffer_size: int
+        Buffer size (bytes) given to open function.
+        1/16 of max_memory, but between io.DEFAULT_BUFFER_SIZE and
+        IO_BUFFER_MAX. If max_memory is None, return -1 (default of open).
+    """
+    if not max_memory:
+        return -1
+    return min(IO_BUFFER_MAX, max(io.DEFAULT_BUFFER_SIZE, max_memory // 16))
+
+
+def Count_columns(input_file_path: str) -> int:
+    """
+    This function counts columns of the first line of a table file.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to tab separated file.
+
+    Returns:
+    ----------
+    n_columns: int
+        Number of columns.
+    """
+    with open(input_file_path, "r") as input_file:
+        return len(input_file.readline().split("\t"))
+
+
+def Count_lines(input_file_path: str) -> int:
+    """
+    This function counts lines of a file by reading it in binary blocks.
+
+    Arguments:
+    ----------
+    input_file_path: str
+        Path to file.
+
+    Returns:
+    ----------
+    n_lines: int
+        Number of lines.
+    """
+    n_lines: int = 0
+    with open(input_file_path, "rb") as input_file:
+        for block in iter(lambda: input_file.read(1024**2), b""):
+            n_lines += block.count(b"\n")
+    return n_lines
+
+
+def main():
+    print("Hello, this is my_memory.py")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,209 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールはPCAのモデルの保存、読み込み、
+新しいサンプルの射影に関する関数をまとめたものです。
+
+モデルはnumpyの.npz形式(圧縮)で保存する。
+    components  主成分負荷量 (PC x SNP)
+    snp_mean    各SNPの平均 (標準化に使う)
+    snp_sd      各SNPの標準偏差 (標準化に使う)
+    pca_mean    標準化後の各SNPの平均 (sklearnのPCA.mean_)
+    snp_ids     SNPのID
+    explained_variance_ratio  寄与率
+'''
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+MODEL_DTYPE: str = "float32"
+
+
+def Save_model(path: str, components: np.ndarray, snp_mean: np.ndarray,
+               snp_sd: np.ndarray, pca_mean: np.ndarray, snp_ids: List[str],
+               explained_variance_ratio: np.ndarray) -> None:
+    """
+    This function saves fitted PCA model as a compressed binary file.
+
+    Arguments:
+    ----------
+    path: str
+        Path to output model file. (.npz)
+    components: np.ndarray
+        Loadings of PCA. (PC x SNP)
+    snp_mean: np.ndarray
+        Mean of each SNP before standardization.
+    snp_sd: np.ndarray
+        Standard deviation of each SNP before standardization.
+    pca_mean: np.ndarray
+        Mean of each SNP after standardization. (PCA.mean_)
+    snp_ids: List[str]
+        ID of each SNP.
+    explained_variance_ratio: np.ndarray
+        Explained variance ratio of each PC.
+    """
+    # 精度はfloat32で十分なので、サイズを半分にする。
+    np.savez_compressed(
+        path,
+        components=np.asarray(components, dtype=MODEL_DTYPE),
+        snp_mean=np.asarray(snp_mean, dtype=MODEL_DTYPE),
+        snp_sd=np.asarray(snp_sd, dtype=MODEL_DTYPE),
+        pca_mean=np.asarray(pca_mean, dtype=MODEL_DTYPE),
+        snp_ids=np.asarray(snp_ids, dtype=str),
+        explained_variance_ratio=np.asarray(explained_variance_ratio))
+
+
+def Load_model(path: str) -> Dict[str, np.ndarray]:
+    """
+    This function loads PCA model saved by Save_model function.
+
+    Arguments:
+    ----------
+    path: str
+        Path to model file. (.npz)
+
+    Returns:
+    ----------
+    model: Dict[str, np.ndarray]
+        Arrays saved by Save_model function.
+    """
+    with np.load(path) as npz:
+        model: Dict[str, np.ndarray] = {key: npz[key] for key in npz.files}
+    return model
+
+
+def Init_scores(model: Dict[str, np.ndarray], n_samples: int) -> np.ndarray:
+    """
+    This function returns initial scores for projection.
+    Standardized genotype of missing SNP is regarded as 0 (mean),
+    so only the PCA.mean_ term is subtracted here.
+
+    Arguments:
+    ----------
+    model: Dict[str, np.ndarray]
+        Model loaded by Load_model function.
+    n_samples: int
+        Number of samples to project.
+
+    Returns:
+    ----------
+    scores: np.ndarray
+        Initial scores. (sample x PC)
+    """
+    offset: np.ndarray = \
+        model["pca_mean"].astype("float64") @ model["components"].T
+    scores: np.ndarray = np.tile(-offset, (n_samples, 1))
+    return scores
+
+
+def Project_chunk(chunk: pd.DataFrame, model: Dict[str, np.ndarray],
+                  snp_index: Dict[str, int], scores: np.ndarray) -> int:
+    """
+    This function projects a chunk of new samples onto fitted PCs,
+    and adds the result to scores.
+
+    Arguments:
+    ----------
+    chunk: pd.DataFrame
+        Chunk of numeric genotype data. (SNP x sample, index is SNP ID)
+    model: Dict[str, np.ndarray]
+        Model loaded by Load_model function.
+    snp_index: Dict[str, int]
+        {SNP ID: position in model}
+    scores: np.ndarray
+        Scores to be updated. (sample x PC)
+
+    Returns:
+    ----------
+    n_used: int
+        Number of SNPs in this chunk used for projection.
+    """
+    # モデルに含まれないSNPは使わない。
+    positions: pd.Series = chunk.index.to_series().map(snp_index)
+    used: np.ndarray = positions.notna().to_numpy()
+    idx: np.ndarray = positions[used].to_numpy(dtype="int64")
+    values: np.ndarray = chunk.to_numpy(dtype="float64")[used]
+
+    # モデル作成時の平均、標準偏差で標準化する。
+    # 欠損値は平均(標準化後は0)とみなす。
+    z: np.ndarray = \
+        (values - model["snp_mean"][idx, None]) / model["snp_sd"][idx, None]
+    z = np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0)
+    scores += z.T @ model["components"][:, idx].T
+    return len(idx)
+
+
+def Standardize_chunk(values: np.ndarray
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This function standardizes each row(SNP) of a chunk,
+    and removes monomorphic SNPs. Used in out-of-core PCA.
+
+    Arguments:
+    ----------
+    values: np.ndarray
+        Numeric genotypes without NA. (SNP x sample)
+
+    Returns:
+    ----------
+    z: np.ndarray
+        Standardized genotypes of polymorphic SNPs. (SNP x sample)
+    snp_mean: np.ndarray
+        Mean of each polymorphic SNP.
+    snp_sd: np.ndarray
+        Standard deviation of each polymorphic SNP.
+    polymorphic: np.ndarray
+        Boolean array, True if the SNP was kept.
+    """
+    snp_mean: np.ndarray = values.mean(axis=1)
+    snp_sd: np.ndarray = values.std(axis=1, ddof=1)
+    # 多型の無いSNPは標準化できない(0で割る)ので除く。
+    polymorphic: np.ndarray = snp_sd > 0
+    z: np.ndarray = (values[polymorphic] - snp_mean[polymorphic, None]) \
+        / snp_sd[polymorphic, None]
+    return z, snp_mean[polymorphic], snp_sd[polymorphic], polymorphic
+
+
+def Gram_eigen(gram: np.ndarray, n_components: int
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This function performs PCA from Gram matrix of samples (Z^T Z),
+    which can be accumulated chunk by chunk of SNPs.
+
+    Arguments:
+    ----------
+    gram: np.ndarray
+        Sum of z.T @ z of all chunks. (sample x sample)
+    n_components: int
+        Number of principal components to keep.
+
+    Returns:
+    ----------
+    scores: np.ndarray
+        Principal component scores. (sample x PC)
+    explained_variance_ratio: np.ndarray
+        Explained variance ratio of each PC.
+    eigenvectors: np.ndarray
+        Left singular vectors of Z^T. (sample x PC)
+    singular_values: np.ndarray
+        Singular values of Z^T.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(gram)
+    # eighは昇順なので降順に並べ替える。丸め誤差の負の値は0にする。
+    eigenvalues = np.clip(eigenvalues[::-1], 0.0, None)
+    eigenvectors = eigenvectors[:, ::-1][:, :n_components]
+    singular_values: np.ndarray = np.sqrt(eigenvalues[:n_components])
+    scores: np.ndarray = eigenvectors * singular_values
+    explained_variance_ratio: np.ndarray = \
+        eigenvalues[:n_components] / eigenvalues.sum()
+    return scores, explained_variance_ratio, eigenvectors, singular_values
+
+
+def main():
+    print("Hello, this is my_pca.py")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,247 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールはグループ(集団)ごとのアレル頻度と
+Fst(Hudson, 1992)、SNPごとのMAF、NAの割合、ヘテロ接合度の
+計算に関する関数をまとめたものです。
+'''
+
+from itertools import combinations
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+# GTからALTアレルの数への変換表、欠損値は-1
+ALT_COUNT: Dict[str, int] = {"0/0": 0, "0/1": 1, "1/0": 1, "1/1": 2}
+
+
+def GT2alt_count(GT_list: List[str]) -> np.ndarray:
+    """
+    This function counts ALT alleles of each sample.
+
+    Arguments:
+    ----------
+    GT_list: List[str]
+        GT list generated by remain_only_GT function.
+
+    Returns:
+    ----------
+    alt_count: np.ndarray
+        Number of ALT alleles (0, 1, 2) of each sample. NA is -1.
+    """
+    return np.fromiter((ALT_COUNT.get(GT, -1) for GT in GT_list),
+                       dtype="int8", count=len(GT_list))
+
+
+def Calc_MAF_NA(alt_count: np.ndarray) -> Tuple[float, float]:
+    """
+    Calculate Minor Allele Frequency and percentage of NA from ALT counts.
+    Same as Calc_MAF and Calc_NA_rate, but reuses counts of GT2alt_count.
+
+    Arguments:
+    ----------
+    alt_count: np.ndarray
+        ALT counts generated by GT2alt_count function.
+
+    Returns:
+    ----------
+    MAF: float
+        Minor Allele Frequency.
+    NA_rate: float
+        Percentage of NA.
+    """
+    genotyped: np.ndarray = alt_count >= 0
+    n_genotyped: int = int(genotyped.sum())
+    NA_rate: float = 1 - n_genotyped / len(alt_count)
+    # 全てNAの場合はnanになる。
+    with np.errstate(divide="ignore", invalid="ignore"):
+        AAF: float = alt_count[genotyped].sum() / np.float64(n_genotyped * 2)
+    MAF: float = min(AAF, 1 - AAF)
+    return MAF, NA_rate
+
+
+def Calc_MAF_NA_dosage(dosage: np.ndarray) -> Tuple[float, float]:
+    """
+    Calculate Minor Allele Frequency and percentage of NA from dosages.
+    Used for VCF which has DS but not GT in FORMAT field.
+
+    Arguments:
+    ----------
+    dosage: np.ndarray
+        ALT allele dosages (0 ~ 2) generated by Values2array function.
+        NA is nan.
+
+    Returns:
+    ----------
+    MAF: float
+        Minor Allele Frequency. nan if all samples are NA.
+    NA_rate: float
+        Percentage of NA.
+    """
+    called: np.ndarray = ~np.isnan(dosage)
+    n_called: int = int(called.sum())
+    NA_rate: float = 1 - n_called / len(dosage)
+    if not n_called:
+        return float("nan"), NA_rate
+    AAF: float = float(dosage[called].sum(dtype="float64")) / (n_called * 2)
+    MAF: float = min(AAF, 1 - AAF)
+    return MAF, NA_rate
+
+
+def Calc_het_rate(alt_count: np.ndarray) -> float:
+    """
+    Calculate observed heterozygosity from ALT counts.
+
+    Arguments:
+    ----------
+    alt_count: np.ndarray
+        ALT counts generated by GT2alt_count function.
+
+    Returns:
+    ----------
+    het_rate: float
+        Percentage of heterozygous samples among genotyped samples.
+        nan if all samples are NA.
+    """
+    n_genotyped: int = int((alt_count >= 0).sum())
+    if not n_genotyped:
+        return float("nan")
+    return int((alt_count == 1).sum()) / n_genotyped
+
+
+def Read_group_file(group_file_path: str, samples: List[str]
+                    ) -> Tuple[List[str], np.ndarray, List[str]]:
+    """
+    Read sample -> group map.
+
+    Arguments:
+    ----------
+    group_file_path: str
+        Path to tab separated file. (sample, group)
+        Header line ("sample" or "#" at the first column) is allowed.
+        Lines of samples not in the VCF are ignored.
+    samples: List[str]
+        Sample names of the VCF.
+
+    Returns:
+    ----------
+    groups: List[str]
+        Group names in order of appearance.
+    group_index: np.ndarray
+        Group number of each sample. Samples not in any group are -1.
+    unmatched: List[str]
+        Samples in the group file which are not in the VCF.
+    """
+    sample_index: Dict[str, int] = {s: i for i, s in enumerate(samples)}
+    groups: List[str] = []
+    group_index: np.ndarray = np.full(len(samples), -1, dtype="int64")
+    unmatched: List[str] = []
+    with open(group_file_path, "r") as group_file:
+        for i, line in enumerate(group_file):
+            fields: List[str] = line.rstrip("\r\n").split("\t")
+            if len(fields) < 2:
+                continue
+            if fields[0] not in sample_index:
+                # ヘッダーは数えない
+                if not (i == 0 and (fields[0].lower() == "sample"
+                                    or fields[0].startswith("#"))):
+                    unmatched.append(fields[0])
+                continue
+            if fields[1] not in groups:
+                groups.append(fields[1])
+            group_index[sample_index[fields[0]]] = groups.index(fields[1])
+    return groups, group_index, unmatched
+
+
+def Group_counts(alt_count: np.ndarray, group_index: np.ndarray,
+                 n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count ALT alleles and genotyped alleles of each group at once.
+
+    Arguments:
+    ----------
+    alt_count: np.ndarray
+        ALT counts generated by GT2alt_count function.
+    group_index: np.ndarray
+        Group number of each sample got from Read_group_file function.
+    n_groups: int
+        Number of groups.
+
+    Returns:
+    ----------
+    alt_alleles: np.ndarray
+        Number of ALT alleles of each group.
+    called_alleles: np.ndarray
+        Number of genotyped alleles of each group.
+    """
+    used: np.ndarray = (alt_count >= 0) & (group_index >= 0)
+    alt_alleles: np.ndarray = np.bincount(
+        group_index[used], weights=alt_count[used], minlength=n_groups)
+    called_alleles: np.ndarray = \
+        2 * np.bincount(group_index[used], minlength=n_groups)
+    return alt_alleles, called_alleles
+
+
+def Group_pairs(groups: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Make all pairs of groups for pairwise Fst.
+
+    Arguments:
+    ----------
+    groups: List[str]
+        Group names.
+
+    Returns:
+    ----------
+    first, second: np.ndarray
+        Group numbers of each pair.
+    """
+    pairs: List[Tuple[int, int]] = list(combinations(range(len(groups)), 2))
+    first: np.ndarray = np.array([i for i, _ in pairs], dtype="int64")
+    second: np.ndarray = np.array([j for _, j in pairs], dtype="int64")
+    return first, second
+
+
+def Hudson_Fst(alt_alleles: np.ndarray, called_alleles: np.ndarray,
+               first: np.ndarray, second: np.ndarray
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculate Hudson's Fst of all pairs of groups at once.
+    (Bhatia et al., 2013, equation 10)
+
+    Arguments:
+    ----------
+    alt_alleles, called_alleles: np.ndarray
+        Counts got from Group_counts function.
+    first, second: np.ndarray
+        Pairs of groups got from Group_pairs function.
+
+    Returns:
+    ----------
+    Fst: np.ndarray
+        Fst of each pair. nan if it can not be calculated.
+    numerator, denominator: np.ndarray
+        Numerator and denominator of Fst,
+        for genome-wide Fst (ratio of averages).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        freq: np.ndarray = alt_alleles / called_alleles
+        p1, p2 = freq[first], freq[second]
+        n1, n2 = called_alleles[first], called_alleles[second]
+        numerator: np.ndarray = (p1 - p2) ** 2 \
+            - p1 * (1 - p1) / (n1 - 1) - p2 * (1 - p2) / (n2 - 1)
+        denominator: np.ndarray = p1 * (1 - p2) + p2 * (1 - p1)
+        # アレルが2つ未満のグループを含むペアは計算できない。
+        valid: np.ndarray = (n1 > 1) & (n2 > 1) & (denominator > 0)
+        Fst: np.ndarray = np.where(valid, numerator / denominator, np.nan)
+    numerator = np.where(valid, numerator, 0.0)
+    denominator = np.where(valid, denominator, 0.0)
+    return Fst, numerator, denominator
+
+
+def main():
+    print("Hello, this is my_popgen.py")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,262 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールは数値化したジェノタイプをバイナリ形式で
+読み書きする関数をまとめたものです。
+
+バイナリストアは以下の3ファイルからなる。
+    <path>          float32の行列(SNP x sample)を行ごとに書き出したもの
+    <path>.sites    各SNPの CHROM POS ID (タブ区切り、1行1SNP)
+    <path>.json     サンプル名、SNP数、dtypeなどのメタ情報
+
+RやpandasではArrow/Parquet形式の方が速く読めるので、
+Parquet形式(サンプルごとの列、SNPのrow group)でも書き出せる。(pyarrowが必要)
+    CHROM int32, POS int64, ID string, 各サンプル int8 (dosageなどはfloat32)
+'''
+
+import json
+from typing import Any, Dict, List, TextIO, Tuple
+
+import numpy as np
+
+
+STORE_DTYPE: str = "float32"
+
+
+def Values2array(values: List[str]) -> np.ndarray:
+    """
+    This function converts numeric strings of one SNP to float32 array.
+
+    Arguments:
+    ----------
+    values: List[str]
+        Numeric genotypes or dosages generated by
+        GT2numeric or Remain_only_DS function. "NA" is allowed.
+
+    Returns:
+    ----------
+    array: np.ndarray
+        float32 array. "NA" is converted to nan.
+    """
+    array: np.ndarray = np.array(
+        [np.nan if x == "NA" else float(x) for x in values],
+        dtype=STORE_DTYPE)
+    return array
+
+
+def Write_site(store_file: Any, sites_file: TextIO,
+               site: List[str], array: np.ndarray) -> None:
+    """
+    This function appends one SNP to the binary store.
+
+    Arguments:
+    ----------
+    store_file:
+        Binary file object opened by open(path, "wb").
+    sites_file: TextIO
+        Text file object of <path>.sites.
+    site: List[str]
+        [CHROM, POS, ID]
+    array: np.ndarray
+        float32 array generated by Values2array function.
+    """
+    store_file.write(array.astype(STORE_DTYPE, copy=False).tobytes())
+    sites_file.write("\t".join(site) + "\n")
+
+
+def Write_store_meta(path: str, samples: List[str], n_sites: int,
+                     value: str, **extra: Any) -> None:
+    """
+    This function writes meta information of the binary store.
+
+    Arguments:
+    ----------
+    path: str
+        Path to the binary store.
+    samples: List[str]
+        Sample names. (columns of the matrix)
+    n_sites: int
+        Number of SNPs. (rows of the matrix)
+    value: str
+        Kind of values. "GT" or "DS".
+    extra: Any
+        Additional information to be recorded.
+    """
+    meta: Dict[str, Any] = {
+        "samples": samples,
+        "n_sites": n_sites,
+        "dtype": STORE_DTYPE,
+        "value": value}
+    meta.update(extra)
+    with open(path + ".json", "w") as meta_file:
+        json.dump(meta, meta_file, indent=1)
+
+
+def Load_store(path: str) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    This function loads the binary store as a memory-mapped matrix.
+
+    Arguments:
+    ----------
+    path: str
+        Path to the binary store.
+
+    Returns:
+    ----------
+    matrix: np.ndarray
+        Memory-mapped matrix. (SNP x sample)
+    meta: Dict[str, Any]
+        Meta information written by Write_store_meta function.
+    """
+    with open(path + ".json", "r") as meta_file:
+        meta: Dict[str, Any] = json.load(meta_file)
+    shape: Tuple[int, int] = (meta["n_sites"], len(meta["samples"]))
+    # SNPが0個の場合memmapは作れない。
+    if shape[0] == 0:
+        return np.empty(shape, dtype=meta["dtype"]), meta
+    matrix: np.ndarray = np.memmap(
+        path, dtype=meta["dtype"], mode="r", shape=shape)
+    return matrix, meta
+
+
+def Parquet_dtype(value: str, convert_rule: List[str], impute: Any) -> str:
+    """
+    This function decides dtype of genotype columns of Parquet output.
+
+    Arguments:
+    ----------
+    value: str
+        "GT" or "DS".
+    convert_rule: List[str]
+        [REF, HETERO, ALT]
+    impute: Any
+        "mean", "mode" or False.
+
+    Returns:
+    ----------
+    dtype: str
+        "int8" if all values are small integers, otherwise "float32".
+    """
+    if value != "GT" or impute == "mean":
+        return "float32"
+    try:
+        if all(-128 <= int(x) <= 127 for x in convert_rule):
+            return "int8"
+    except ValueError:
+        pass
+    return "float32"
+
+
+def Open_parquet(path: str, samples: List[str], dtype: str,
+                 row_group_size: int, **metadata: Any) -> Dict[str, Any]:
+    """
+    This function opens Parquet writer. pyarrow is required.
+
+    Arguments:
+    ----------
+    path: str
+        Path to output Parquet file.
+    samples: List[str]
+        Sample names. (genotype columns)
+    dtype: str
+        dtype of genotype columns got from Parquet_dtype function.
+    row_group_size: int
+        Number of SNPs in a row group.
+    metadata: Any
+        Information recorded in the schema metadata. (e.g. contig codes)
+
+    Returns:
+    ----------
+    parquet: Dict[str, Any]
+        State of the writer. Give it to Write_parquet, Close_parquet.
+    """
+    import pyarrow as pa # Parquetで出力する場合だけ必要
+    import pyarrow.parquet as pq
+    schema = pa.schema(
+        [("CHROM", pa.int32()), ("POS", pa.int64()), ("ID", pa.string())]
+        + [(sample, pa.from_numpy_dtype(np.dtype(dtype)))
+           for sample in samples],
+        metadata={key: json.dumps(val) for key, val in metadata.items()})
+    parquet: Dict[str, Any] = {
+        "pa": pa,
+        "writer": pq.ParquetWriter(path, schema, compression="zstd"),
+        "schema": schema,
+        "dtype": dtype,
+        "sites": [],
+        "block": np.empty((row_group_size, len(samples)), dtype=STORE_DTYPE),
+        "n": 0}
+    return parquet
+
+
+def Write_parquet(parquet: Dict[str, Any], site: List[str],
+                  array: np.ndarray) -> None:
+    """
+    This function appends one SNP to Parquet output.
+    A row group is written when the buffer is full.
+
+    Arguments:
+    ----------
+    parquet: Dict[str, Any]
+        State of the writer got from Open_parquet function.
+    site: List[str]
+        [CHROM(code), POS, ID]
+    array: np.ndarray
+        float32 array generated by Values2array function.
+    """
+    parquet["block"][parquet["n"]] = array
+    parquet["sites"].append(site)
+    parquet["n"] += 1
+    if parquet["n"] == len(parquet["block"]):
+        Flush_parquet(parquet)
+
+
+def Flush_parquet(parquet: Dict[str, Any]) -> None:
+    """
+    This function writes buffered SNPs as a row group.
+
+    Arguments:
+    ----------
+    parquet: Dict[str, Any]
+        State of the writer got from Open_parquet function.
+    """
+    if not parquet["n"]:
+        return
+    pa = parquet["pa"]
+    block: np.ndarray = parquet["block"][:parquet["n"]]
+    missing: np.ndarray = np.isnan(block)
+    # 欠損値(nan)はnullにする。
+    values: np.ndarray = np.where(missing, 0, block).astype(parquet["dtype"])
+    # サンプルごとの列として切り出すので、転置して連続した配列にする。
+    values = np.ascontiguousarray(values.T)
+    missing = np.ascontiguousarray(missing.T)
+    chrom, pos, ID = zip(*parquet["sites"])
+    columns: list = [
+        pa.array(np.array(chrom, dtype="int32")),
+        pa.array(np.array(pos, dtype="int64")),
+        pa.array(ID, type=pa.string())]
+    columns += [pa.array(column, mask=mask)
+                for column, mask in zip(values, missing)]
+    parquet["writer"].write_table(
+        pa.Table.from_arrays(columns, schema=parquet["schema"]))
+    parquet["sites"] = []
+    parquet["n"] = 0
+
+
+def Close_parquet(parquet: Dict[str, Any]) -> None:
+    """
+    This function writes remaining SNPs and closes Parquet output.
+
+    Arguments:
+    ----------
+    parquet: Dict[str, Any]
+        State of the writer got from Open_parquet function.
+    """
+    Flush_parquet(parquet)
+    parquet["writer"].close()
+
+
+def main():
+    print("Hello, this is my_store.py")
+
+if __name__=="__main__":
+    main()
@@ -71,7 +71,7 @@ def Multi_pop(target_list: List[Any], index_list: List[int]) -> list:
     """
     index_list.sort(reverse=True)
     # IndexErrorを避ける処理
-    while index_list[0] >= len(target_list):
+    while index_list and index_list[0] >= len(target_list):
         index_list.pop(0)
     # target_listから除く
     for i in index_list:
@@ -5,9 +5,22 @@
 '''
 
 from collections import Counter
-from typing import Counter, List, Pattern
+from functools import lru_cache
+from typing import Any, Counter, Dict, List, Optional, Pattern
 import re
 
+
+# 正規表現は読み込み時に一度だけコンパイルする。
+CHROM_NUMBER: Pattern = re.compile(r"[1-9]\d*")
+# "1", "chr01", "Chr7"のような番号だけの染色体名
+NUMERIC_CHROM: Pattern = re.compile(r"^(?:chr|Chr|CHR)?0*([1-9]\d*)$")
+CONTIG_ID: Pattern = re.compile(r"^##contig=<(?:.*,)?ID=([^,>]+)")
+# Remain_only_GTで受け付けるGT("0/1", "./."など)
+EXPECTED_GT: Pattern = re.compile(r"(\d/\d)|(\./\.)")
+# 番号の無い染色体(X, MTなど)のコードはここから振る。
+# 番号の染色体と入力の順番によらず重ならないようにするため。
+OTHER_CODE_BASE: int = 100000
+
 def Check_alt(alt: str) -> bool:
     """
     This function check ALT field of VCF. 
@@ -32,7 +45,56 @@ def Check_alt(alt: str) -> bool:
         return False
 
 
-def Remain_only_GT(geno: str) -> str:
+@lru_cache(maxsize=None)
+def Parse_format(fmt: str) -> Dict[str, int]:
+    """
+    This function maps each subfield of FORMAT field to its index.
+    The result is cached, so each FORMAT string is parsed only once.
+    
+    Arguments:
+    ----------
+    fmt: str
+        FORMAT field of each Data line on input VCF.
+        (e.g. "GT:AD:DP:GQ:PL")
+    
+    Returns:
+    ----------
+    layout: Dict[str, int]
+        {subfield: index} (e.g. {"GT": 0, "AD": 1, ...})
+        Cached object is shared, so do not modify it.
+    """
+    # VCFの各行で同じFORMATが繰り返されるのでキャッシュする。
+    layout: Dict[str, int] = \
+        {key: i for i, key in enumerate(fmt.split(":"))}
+    return layout
+
+
+def Get_subfield(geno: str, index: int) -> str:
+    """
+    This function returns one subfield from Genotype field by its index.
+    
+    Arguments:
+    ----------
+    geno: str
+        Genotype field of input VCF.
+    index: int
+        Index of subfield got from Parse_format function.
+    
+    Returns:
+    ----------
+    value: str
+        Value of the subfield.
+        If the subfield is dropped, return "." (missing value).
+    """
+    # 必要な位置までしか分割しない。
+    values: List[str] = geno.split(":", index + 1)
+    # VCFでは末尾のsubfieldが省略されることがある。
+    if index >= len(values):
+        return "."
+    return values[index]
+
+
+def Remain_only_GT(geno: str, GT_index: int = 0) -> str:
     """
     This function will return GT(genotype) from Genotype field.
     
@@ -40,25 +102,49 @@ def Remain_only_GT(geno: str) -> str:
     ----------
     geno: str
         Genotype field of input VCF.
+    GT_index: int
+        Index of GT in FORMAT field got from Parse_format function.
+        default=0
     
     Returns:
     ----------
     GT: str
         GT(genotype) from Genotype field.
     """
-    expected_GT: Pattern = re.compile("(\d/\d)|(\./\.)")
-
     # geno_list: List[str] = line.split("\t")[9:]
     # 各Data lineの9列目以降、各列がgenotype fieldに相当
-    GT: str = geno.split(":")[0].replace("|", "/")
+    GT: str = Get_subfield(geno, GT_index).replace("|", "/")
 
     #GATKを使った際にフォーマットに則らないジェノタイプが出てきたことがある。(仕様？)
     #そうしたジェノタイプは欠損値に変換する。
-    if not re.match(expected_GT, GT):
+    if not EXPECTED_GT.match(GT):
         GT = "./."
     return GT
 
 
+def Remain_only_DS(geno: str, DS_index: int) -> str:
+    """
+    This function will return DS(dosage) from Genotype field.
+    
+    Arguments:
+    ----------
+    geno: str
+        Genotype field of input VCF.
+    DS_index: int
+        Index of DS in FORMAT field got from Parse_format function.
+    
+    Returns:
+    ----------
+    DS: str
+        DS(ALT allele dosage, 0 ~ 2) from Genotype field.
+        If DS is missing, return "NA".
+    """
+    DS: str = Get_subfield(geno, DS_index)
+    if DS == ".":
+        DS = "NA"
+    return DS
+
+
 def GT2numeric(GT_list: List[str], convert_rule: List[str]) -> List[str]:
     """
     This function change GT to numeric data.
@@ -99,10 +185,12 @@ def Calc_MAF(GT_list: List[str]) -> float:
     Returns:
     ----------
     MAF: float
-        Minor Allele Frequency.
+        Minor Allele Frequency. nan if all samples are NA.
     """
     Count_Summary: Counter = Counter(GT_list)
     Genotyped: int = (len(GT_list) - Count_Summary["./."]) * 2
+    if not Genotyped:
+        return float("nan")
     ALT_num: int = Count_Summary["0/1"] \
                  + Count_Summary["1/0"] \
                  + Count_Summary["1/1"] * 2
@@ -147,9 +235,132 @@ def Change_chrom(chrom: str) -> str:
         Number of chromosome.
     """
     # 染色体の数字だけ抜き出す。
-    # XやYのような文字には非対応。
-    regix: Pattern = re.compile(r"[1-9]\d*")
-    return re.findall(regix, chrom)[-1]
+    # XやYのような数字を含まない染色体名はそのまま返す。
+    # コード化にはBuild_contig_dict, Chrom_codeを使う方が良い。
+    numbers: List[str] = CHROM_NUMBER.findall(chrom)
+    return numbers[-1] if numbers else chrom
+
+
+def Parse_contig(line: str) -> Optional[str]:
+    """
+    Get contig name from ##contig Meta-information line.
+    
+    Arguments:
+    ----------
+    line: str
+        Meta-information line of input VCF.
+        (e.g. ##contig=<ID=Chr07,length=60000000>)
+    
+    Returns:
+    ----------
+    contig: str
+        Contig name. If the line is not ##contig line, return None.
+    """
+    matched = CONTIG_ID.match(line)
+    return matched.group(1) if matched else None
+
+
+def Chrom_code(chrom: str, contig_dict: Dict[str, Any]) -> int:
+    """
+    Get integer code of chromosome.
+    Codes are memoized in contig_dict, so each name is resolved only once.
+    
+    Arguments:
+    ----------
+    chrom: str
+        #CHROM field of each Data line on input VCF.
+    contig_dict: Dict[str, Any]
+        Contig dictionary generated by Build_contig_dict function.
+        Unknown contig is added to this dict.
+    
+    Returns:
+    ----------
+    code: int
+        Code of chromosome.
+            Chr07, chr7, 7, Gm07, SL4.0ch07 -> 7 (last number, Change_chrom)
+            X, MT etc. and duplicated numbers -> OTHER_CODE_BASE + 1, 2, ...
+                (in order of ##contig lines, or of appearance)
+    """
+    codes: Dict[str, int] = contig_dict["codes"]
+    try:
+        return codes[chrom]
+    except KeyError:
+        pass
+    # 初めて見る染色体名の場合だけ解析する。
+    used: set = contig_dict["used"]
+    numbers: List[str] = CHROM_NUMBER.findall(chrom)
+    code: int = int(numbers[-1]) if numbers else 0
+    # 番号の無い染色体名や、番号が重複する場合は番号と重ならない範囲から振る。
+    if not code or code >= OTHER_CODE_BASE or code in used:
+        code = OTHER_CODE_BASE + 1
+        while code in used:
+            code += 1
+    codes[chrom] = code
+    used.add(code)
+    return code
+
+
+def Build_contig_dict(contigs: List[str]) -> Dict[str, Any]:
+    """
+    Build contig dictionary from contig names in ##contig lines.
+    Numeric contigs keep their number,
+    and the others are coded from OTHER_CODE_BASE in the order of the header.
+    
+    Arguments:
+    ----------
+    contigs: List[str]
+        Contig names got from Parse_contig function.
+        Give an empty list if input VCF has no ##contig line.
+    
+    Returns:
+    ----------
+    contig_dict: Dict[str, Any]
+        {"codes": {contig name: code}, "used": set of used codes}
+    """
+    contig_dict: Dict[str, Any] = {"codes": {}, "used": set()}
+    # 先に番号だけの染色体にコードを振ってから、それ以外にコードを振る。
+    # こうしないとscaffold_1などがchr1とコードを取り合う。
+    numeric: List[str] = [c for c in contigs if NUMERIC_CHROM.match(c)]
+    others: List[str] = [c for c in contigs if not NUMERIC_CHROM.match(c)]
+    for contig in numeric + others:
+        Chrom_code(contig, contig_dict)
+    return contig_dict
+
+
+def Check_order(code: int, pos: int, order_state: Dict[str, Any]) -> bool:
+    """
+    Check whether Data lines are sorted by chromosome and position.
+    Each site is checked in constant time.
+    
+    Arguments:
+    ----------
+    code: int
+        Code of chromosome got from Chrom_code function.
+    pos: int
+        POS field of each Data line on input VCF.
+    order_state: Dict[str, Any]
+        State of the previous site. Give an empty dict at first site.
+    
+    Returns:
+    ----------
+    return: bool
+        If this site is in order, return True.
+        If position decreased, or chromosome appeared again
+        after the other chromosome, return False.
+    """
+    if not order_state:
+        order_state.update(code=None, pos=0, finished=set())
+    in_order: bool = True
+    if code != order_state["code"]:
+        # 一度終わった染色体が再び出てきた場合
+        if code in order_state["finished"]:
+            in_order = False
+        order_state["finished"].add(order_state["code"])
+        order_state["code"] = code
+    elif pos < order_state["pos"]:
+        in_order = False
+    order_state["pos"] = pos
+    return in_order
 
 
 def main():
@@ -0,0 +1,189 @@
+#! /usr/local/bin/python3
+#! coding: utf-8
+'''
+このモジュールはSNPごとの統計量(10_after_imputation.pyの--site-stats)を
+染色体ごとの累積和(prefix sum)にまとめ、
+ゲノム上のウィンドウごとに集計する関数をまとめたものです。
+
+累積和は全ての染色体をつなげた配列で、先頭に0を置く。
+    chrom        各SNPの染色体のコード
+    pos          各SNPの物理位置 (染色体、物理位置の順)
+    contigs      染色体のコード
+    bounds       各染色体の最初と最後+1のSNPの番号 (contig x 2)
+    sum_<stat>   統計量の累積和 (NAは0として足す)
+    n_<stat>     NAでない値の数の累積和
+ウィンドウの合計は両端の累積和の差なので、
+ウィンドウの大きさによらず1つのウィンドウにつき定数時間で求まる。
+(ウィンドウの端の位置は二分探索で探す)
+'''
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+STATS: List[str] = ["MAF", "NA_RATE", "HET_RATE", "PASS"]
+
+
+def Build_prefix(site_stats_path: str, chunk_size: int = 1000000
+                 ) -> Dict[str, np.ndarray]:
+    """
+    This function reads site statistics once by chunks,
+    and builds prefix sums of each statistic.
+
+    Arguments:
+    ----------
+    site_stats_path: str
+        Path to output of --site-stats of 10_after_imputation.py.
+    chunk_size: int
+        Number of lines to read at one time.
+
+    Returns:
+    ----------
+    prefix: Dict[str, np.ndarray]
+        Prefix sums described in the module docstring.
+    """
+    chrom_list: List[np.ndarray] = []
+    pos_list: List[np.ndarray] = []
+    value_list: Dict[str, List[np.ndarray]] = {stat: [] for stat in STATS}
+    reader = pd.read_csv(
+        site_stats_path, sep="\t", chunksize=chunk_size,
+        usecols=["CHROM", "POS"] + STATS,
+        dtype={"CHROM": "int64", "POS": "int64"})
+    for chunk in reader:
+        chrom_list.append(chunk["CHROM"].to_numpy())
+        pos_list.append(chunk["POS"].to_numpy())
+        for stat in STATS:
+            value_list[stat].append(chunk[stat].to_numpy(dtype="float64"))
+
+    chrom: np.ndarray = np.concatenate(chrom_list) if chrom_list \
+        else np.zeros(0, dtype="int64")
+    pos: np.ndarray = np.concatenate(pos_list) if pos_list \
+        else np.zeros(0, dtype="int64")
+    # 並んでいない入力(10_after_imputation.pyで警告が出たもの)にも対応する
+    order: np.ndarray = np.lexsort((pos, chrom))
+    chrom, pos = chrom[order], pos[order]
+
+    contigs, starts = np.unique(chrom, return_index=True)
+    bounds: np.ndarray = np.stack(
+        [starts, np.append(starts[1:], len(chrom))], axis=1)
+    prefix: Dict[str, np.ndarray] = {
+        "chrom": chrom, "pos": pos, "contigs": contigs, "bounds": bounds}
+    for stat in STATS:
+        values: np.ndarray = np.concatenate(value_list[stat])[order] \
+            if chrom_list else np.zeros(0)
+        valid: np.ndarray = ~np.isnan(values)
+        prefix[f"sum_{stat}"] = \
+            np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+        prefix[f"n_{stat}"] = \
+            np.concatenate([[0], np.cumsum(valid, dtype="int64")])
+    return prefix
+
+
+def Save_prefix(path: str, prefix: Dict[str, np.ndarray]) -> None:
+    """
+    This function saves prefix sums as a compressed binary file.
+
+    Arguments:
+    ----------
+    path: str
+        Path to output file. (.npz)
+    prefix: Dict[str, np.ndarray]
+        Prefix sums got from Build_prefix function.
+    """
+    np.savez_compressed(path, **prefix)
+
+
+def Load_prefix(path: str) -> Dict[str, np.ndarray]:
+    """
+    This function loads prefix sums saved by Save_prefix function.
+
+    Arguments:
+    ----------
+    path: str
+        Path to prefix sums file. (.npz)
+
+    Returns:
+    ----------
+    prefix: Dict[str, np.ndarray]
+        Prefix sums described in the module docstring.
+    """
+    with np.load(path) as npz:
+        prefix: Dict[str, np.ndarray] = {key: npz[key] for key in npz.files}
+    return prefix
+
+
+def Window_edges(pos: np.ndarray, window_size: int
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    This function makes windows of a contig and finds SNPs at their edges.
+
+    Arguments:
+    ----------
+    pos: np.ndarray
+        Sorted positions of SNPs of a contig.
+    window_size: int
+        Size(bp) of window.
+
+    Returns:
+    ----------
+    starts: np.ndarray
+        Start position of each window. (window is start ~ start+size-1)
+    edges: np.ndarray
+        Number of the first SNP of each window, and the end. (window + 1)
+    """
+    n_windows: int = int((pos[-1] - 1) // window_size) + 1 if len(pos) else 0
+    bounds: np.ndarray = np.arange(n_windows + 1, dtype="int64") * window_size
+    # 物理位置は1から始まるので、k番目のウィンドウはk*size+1 ~ (k+1)*size
+    edges: np.ndarray = np.searchsorted(pos, bounds, side="right")
+    return bounds[:-1] + 1, edges
+
+
+def Window_summary(prefix: Dict[str, np.ndarray],
+                   window_size: int) -> pd.DataFrame:
+    """
+    This function summarizes site statistics by windows of all contigs
+    from prefix sums.
+
+    Arguments:
+    ----------
+    prefix: Dict[str, np.ndarray]
+        Prefix sums got from Build_prefix or Load_prefix function.
+    window_size: int
+        Size(bp) of window.
+
+    Returns:
+    ----------
+    summary: pd.DataFrame
+        CHROM, START, END, N_SITES, and mean of each statistic
+        (nan if no value in the window) of each window.
+    """
+    tables: List[pd.DataFrame] = []
+    for contig, (first, last) in zip(prefix["contigs"], prefix["bounds"]):
+        starts, edges = Window_edges(prefix["pos"][first:last], window_size)
+        edges = edges + first
+        table: pd.DataFrame = pd.DataFrame({
+            "CHROM": np.full(len(starts), contig),
+            "START": starts,
+            "END": starts + window_size - 1,
+            "N_SITES": np.diff(edges)})
+        for stat in STATS:
+            # ウィンドウの合計は両端の累積和の差
+            total: np.ndarray = np.diff(prefix[f"sum_{stat}"][edges])
+            count: np.ndarray = np.diff(prefix[f"n_{stat}"][edges])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                table[f"MEAN_{stat}"] = \
+                    np.where(count > 0, total / count, np.nan)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=["CHROM", "START", "END", "N_SITES"]
+                            + [f"MEAN_{stat}" for stat in STATS])
+    return pd.concat(tables, ignore_index=True)
+
+
+def main():
+    print("Hello, this is my_window.py")
+
+if __name__=="__main__":
+    main()